@@ -0,0 +1,27 @@
+"""Add (user_id, id) index to contents for keyset pagination
+
+Revision ID: 2d9c4f7a6e15
+Revises: 4c7e2a9d1b63
+Create Date: 2026-10-15 13:42:07.118254
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import pgvector
+
+
+# revision identifiers, used by Alembic.
+revision = '2d9c4f7a6e15'
+down_revision = '4c7e2a9d1b63'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contents', schema=None) as batch_op:
+        batch_op.create_index('ix_contents_user_id_id', ['user_id', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('contents', schema=None) as batch_op:
+        batch_op.drop_index('ix_contents_user_id_id')
@@ -0,0 +1,27 @@
+"""Add composite index for keyset pagination of query history
+
+Revision ID: 4c7e2a9d1b63
+Revises: ab56a45ffbcc
+Create Date: 2026-10-15 10:12:41.204117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import pgvector
+
+
+# revision identifiers, used by Alembic.
+revision = '4c7e2a9d1b63'
+down_revision = 'ab56a45ffbcc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('queries', schema=None) as batch_op:
+        batch_op.create_index('ix_queries_user_id_timestamp_id', ['user_id', 'timestamp', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('queries', schema=None) as batch_op:
+        batch_op.drop_index('ix_queries_user_id_timestamp_id')
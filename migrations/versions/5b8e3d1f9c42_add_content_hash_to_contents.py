@@ -0,0 +1,29 @@
+"""Add content_hash to contents for detecting duplicate uploads
+
+Revision ID: 5b8e3d1f9c42
+Revises: 2d9c4f7a6e15
+Create Date: 2026-10-15 15:06:41.730912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import pgvector
+
+
+# revision identifiers, used by Alembic.
+revision = '5b8e3d1f9c42'
+down_revision = '2d9c4f7a6e15'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('contents', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('content_hash', sa.String(length=64), nullable=True))
+        batch_op.create_index(batch_op.f('ix_contents_content_hash'), ['content_hash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('contents', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_contents_content_hash'))
+        batch_op.drop_column('content_hash')
@@ -0,0 +1,28 @@
+"""Add half-precision HNSW index on embeddings for similarity search
+
+Revision ID: 7c4a1e9b2f60
+Revises: 5b8e3d1f9c42
+Create Date: 2026-10-15 16:21:09.402317
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import pgvector
+
+
+# revision identifiers, used by Alembic.
+revision = '7c4a1e9b2f60'
+down_revision = '5b8e3d1f9c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.execute(
+        "CREATE INDEX ix_embeddings_vector_halfvec ON embeddings "
+        "USING hnsw ((vector::halfvec(1024)) halfvec_cosine_ops)"
+    )
+
+
+def downgrade():
+    op.execute("DROP INDEX ix_embeddings_vector_halfvec")
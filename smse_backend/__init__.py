@@ -6,6 +6,7 @@ from flask_jwt_extended import JWTManager
 from flask_cors import CORS
 from flask_swagger_ui import get_swaggerui_blueprint
 import os
+import redis
 
 # Initialize extensions
 db = SQLAlchemy()
@@ -40,6 +41,12 @@ def create_app(config_name="DevelopmentConfig"):
 
     app.config.from_object(config)
 
+    # Serialize JSON responses with orjson when it is installed
+    from smse_backend.utils.json_provider import ORJSONProvider, HAS_ORJSON
+
+    if HAS_ORJSON:
+        app.json = ORJSONProvider(app)
+
     CORS(app, origins=["https://smseai.me", "https://web.smseai.me"])
 
     # Ensure upload directory exists
@@ -53,10 +60,29 @@ def create_app(config_name="DevelopmentConfig"):
 
     # Initialize file storage service
     from smse_backend.services.file_storage import FileStorageService
-    from smse_backend.services.thumbnail import ThumbnailService
-
-    app.file_storage = FileStorageService()
-    app.thumbnail_service = ThumbnailService(app.file_storage)
+    from smse_backend.services.thumbnail import ThumbnailService, HAS_LIBJPEG_TURBO
+
+    app.file_storage = FileStorageService(app)
+    app.thumbnail_service = ThumbnailService(
+        app.file_storage, max_workers=app.config["THUMBNAIL_WORKERS"]
+    )
+    if not HAS_LIBJPEG_TURBO:
+        app.logger.warning(
+            "Pillow is built without libjpeg-turbo, thumbnails will be slower"
+        )
+
+    # Redis client shared by the services (connects lazily on first use)
+    app.redis = redis.Redis.from_url(app.config["REDIS_URL"])
+
+    # In-process cache of search results, invalidated across processes
+    # through Redis
+    from smse_backend.services.query_cache import QueryResultCache
+
+    app.query_cache = QueryResultCache(
+        maxsize=app.config["SEARCH_RESULT_CACHE_SIZE"],
+        ttl=app.config["SEARCH_RESULT_CACHE_TTL"],
+        redis_client=app.redis,
+    )
 
     # Register blueprints
     from smse_backend.routes import register_blueprints
@@ -26,9 +26,33 @@ class BaseConfig:
     # File upload configurations
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16 MB max file size
     UPLOAD_FOLDER = "tmp/uploads"
+    # Parse multipart uploads incrementally and write them straight to storage
+    STREAMING_UPLOADS = os.environ.get("STREAMING_UPLOADS", "false").lower() == "true"
+    UPLOAD_READ_CHUNK_SIZE = int(os.environ.get("UPLOAD_READ_CHUNK_SIZE", 256 * 1024))
+    # Draw every stored filename's UUID from urandom so names can't be guessed
+    # from other names; otherwise a per-process random node and counter are
+    # used (downloads are authorized by owner, not by knowing the name)
+    UNGUESSABLE_FILENAMES = (
+        os.environ.get("UNGUESSABLE_FILENAMES", "false").lower() == "true"
+    )
+    # Threads used to clean up query files in parallel across user directories
+    CLEANUP_WORKERS = int(os.environ.get("CLEANUP_WORKERS", 8))
+    # Threads that run blocking storage calls for the async file storage API
+    STORAGE_IO_WORKERS = int(os.environ.get("STORAGE_IO_WORKERS", 16))
+    # Threads that generate thumbnails after the upload has responded
+    # (0 generates them during the upload request)
+    THUMBNAIL_WORKERS = int(os.environ.get("THUMBNAIL_WORKERS", 2))
 
     # Storage configuration
     STORAGE_TYPE = os.environ.get("STORAGE_TYPE", "local")  # 'local' or 's3'
+    # Hand local file downloads to the reverse proxy with X-Accel-Redirect;
+    # the proxy must map this internal location onto UPLOAD_FOLDER
+    USE_X_ACCEL_REDIRECT = (
+        os.environ.get("USE_X_ACCEL_REDIRECT", "false").lower() == "true"
+    )
+    X_ACCEL_REDIRECT_PREFIX = os.environ.get(
+        "X_ACCEL_REDIRECT_PREFIX", "/internal_uploads/"
+    )
 
     # S3 configurations (used when STORAGE_TYPE='s3')
     S3_BUCKET_NAME = os.environ.get("S3_BUCKET_NAME", "smse-files")
@@ -37,6 +61,10 @@ class BaseConfig:
     S3_SECRET_KEY = os.environ.get("S3_SECRET_KEY", "minioadmin")
     S3_REGION_NAME = os.environ.get("S3_REGION_NAME", "us-east-1")
     S3_USE_SSL = os.environ.get("S3_USE_SSL", "false").lower() == "true"
+    # Object existence and info are cached per process for this many seconds
+    # (0 disables), saving repeated HEAD requests for the same key
+    S3_METADATA_CACHE_TTL = float(os.environ.get("S3_METADATA_CACHE_TTL", 5))
+    S3_METADATA_CACHE_SIZE = int(os.environ.get("S3_METADATA_CACHE_SIZE", 10000))
 
     # Celery configurations
     CELERY_BROKER_URL = os.environ.get("CELERY_BROKER_URL", "redis://localhost:6379/0")
@@ -44,8 +72,38 @@ class BaseConfig:
         "CELERY_RESULT_BACKEND", "redis://localhost:6379/0"
     )
 
+    # Queue consumed by the workers that embed uploaded content
+    EMBEDDING_QUEUE = os.environ.get("EMBEDDING_QUEUE", "embeddings")
+    # Uploads are embedded in batches of up to this many files (1 disables
+    # batching); a partial batch is flushed after the timeout in seconds
+    EMBEDDING_BATCH_SIZE = int(os.environ.get("EMBEDDING_BATCH_SIZE", 50))
+    EMBEDDING_BATCH_TIMEOUT = int(os.environ.get("EMBEDDING_BATCH_TIMEOUT", 30))
+
+    # Redis configurations
+    REDIS_URL = os.environ.get("REDIS_URL", CELERY_BROKER_URL)
+
+    # Model that embeddings are created with (constant, so never looked up per request)
+    DEFAULT_MODEL_ID = int(os.environ.get("DEFAULT_MODEL_ID", 1))
+
     # SMSE configurations
     SMSE_CHECKPOINTS_PATH = os.environ.get("SMSE_CHECKPOINTS_PATH", "./.checkpoints")
 
+    # Search configurations
+    # Query embeddings are cached in Redis for this many seconds (0 disables)
+    QUERY_EMBEDDING_CACHE_TTL = int(
+        os.environ.get("QUERY_EMBEDDING_CACHE_TTL", 24 * 60 * 60)
+    )
+    # The most recent query embeddings are also kept in process memory
+    QUERY_EMBEDDING_LOCAL_CACHE_SIZE = int(
+        os.environ.get("QUERY_EMBEDDING_LOCAL_CACHE_SIZE", 1024)
+    )
+    # The HNSW index explores this many candidates per requested result
+    # (hnsw.ef_search, kept within pgvector's 40 to 1000)
+    PGVECTOR_EF_MULTIPLIER = int(os.environ.get("PGVECTOR_EF_MULTIPLIER", 4))
+    # Search results are cached per process for this many seconds (0 disables),
+    # keyed by user, rounded query embedding, modalities and limit
+    SEARCH_RESULT_CACHE_TTL = float(os.environ.get("SEARCH_RESULT_CACHE_TTL", 30))
+    SEARCH_RESULT_CACHE_SIZE = int(os.environ.get("SEARCH_RESULT_CACHE_SIZE", 1024))
+
     # JWT Configurations
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(minutes=30)
@@ -29,3 +29,5 @@ class TestConfig(BaseConfig):
     CELERY_ALWAYS_EAGER = (
         True  # Tasks will be executed locally instead of being sent to the queue
     )
+    # Generate thumbnails during the request so tests can check them right away
+    THUMBNAIL_WORKERS = 0
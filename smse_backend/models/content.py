@@ -1,11 +1,24 @@
 from smse_backend.models import BaseModel
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, func
+from sqlalchemy import (
+    Column,
+    Integer,
+    String,
+    Boolean,
+    ForeignKey,
+    DateTime,
+    Index,
+    func,
+)
 from sqlalchemy.orm import Relationship
 from smse_backend.utils.file_extensions import get_modality_from_extension
 
 
 class Content(BaseModel):
     __tablename__ = "contents"
+    __table_args__ = (
+        # Supports keyset pagination of a user's contents
+        Index("ix_contents_user_id_id", "user_id", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     content_path = Column(String(250), unique=True, nullable=False)
@@ -13,6 +26,8 @@ class Content(BaseModel):
     upload_date = Column(DateTime, server_default=func.now(), nullable=False)
     content_size = Column(Integer, nullable=False)
     thumbnail_path = Column(String(250), nullable=True)  # Path to thumbnail image
+    # SHA-256 of the file, used to detect duplicate uploads
+    content_hash = Column(String(64), nullable=True, index=True)
     user_id = Column(
         Integer,
         ForeignKey("users.id", ondelete="CASCADE"),
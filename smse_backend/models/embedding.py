@@ -1,14 +1,57 @@
+import numpy as np
 from pgvector.sqlalchemy import Vector
 from sqlalchemy import Column, Integer, ForeignKey, String
 from sqlalchemy.orm import Relationship, mapped_column
 from smse_backend.models.base import BaseModel
 
+# Dimension of the vectors produced by the embedding model
+EMBEDDING_DIM = 1024
+
+
+class Float32Vector(Vector):
+    """
+    pgvector column that exchanges vectors as float32.
+
+    pgvector stores float4 components, but the stock type formats each value
+    as a float64 repr in a Python loop. Formatting the float32 array directly
+    gives the shortest text that round-trips, roughly halving the bytes sent
+    per vector, and results are parsed by numpy instead of per-element floats.
+    """
+
+    cache_ok = True
+
+    def bind_processor(self, dialect):
+        def process(value):
+            if value is None or isinstance(value, str):
+                return value
+
+            value = np.asarray(value, dtype=np.float32)
+            if value.ndim != 1:
+                raise ValueError("expected ndim to be 1")
+            if self.dim is not None and value.shape[0] != self.dim:
+                raise ValueError(
+                    f"expected {self.dim} dimensions, not {value.shape[0]}"
+                )
+            return "[" + ",".join(value.astype(str)) + "]"
+
+        return process
+
+    def result_processor(self, dialect, coltype):
+        def process(value):
+            if value is None:
+                return None
+            if isinstance(value, str):
+                return np.fromstring(value[1:-1], dtype=np.float32, sep=",")
+            return np.asarray(value, dtype=np.float32)
+
+        return process
+
 
 class Embedding(BaseModel):
     __tablename__ = "embeddings"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    vector = mapped_column(Vector(1024), nullable=True)
+    vector = mapped_column(Float32Vector(EMBEDDING_DIM), nullable=True)
 
     # Add modality field - can be "image", "audio", "text"
     modality = Column(String(20), nullable=True)
@@ -1,10 +1,14 @@
-from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey
+from sqlalchemy import Column, Integer, String, DateTime, func, ForeignKey, Index
 from sqlalchemy.orm import Relationship
 from smse_backend.models.base import BaseModel
 
 
 class Query(BaseModel):
     __tablename__ = "queries"
+    __table_args__ = (
+        # Supports keyset pagination of a user's query history
+        Index("ix_queries_user_id_timestamp_id", "user_id", "timestamp", "id"),
+    )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
     text = Column(String(250), nullable=False)
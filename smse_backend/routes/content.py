@@ -2,63 +2,165 @@ from flask import (
     Blueprint,
     request,
     jsonify,
+    make_response,
     send_file,
     current_app,
 )
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from celery.result import AsyncResult
+from werkzeug.exceptions import HTTPException
 from smse_backend import db
-from smse_backend.models import Content
+from smse_backend.models import Content, Embedding, Task
+from smse_backend.services.file_storage import HAS_STREAMING_FORM_DATA
 from smse_backend.utils.file_extensions import is_allowed_file
 from mimetypes import guess_type
 import io
+import posixpath
 
 content_bp = Blueprint("content", __name__)
 
 
+def _is_streaming_upload():
+    """Check whether the current upload should be streamed straight to storage."""
+    return (
+        current_app.config["STREAMING_UPLOADS"]
+        and HAS_STREAMING_FORM_DATA
+        and request.mimetype == "multipart/form-data"
+    )
+
+
 @content_bp.route("/contents", methods=["POST"])
 @jwt_required()
 def create_content():
     current_user_id = get_jwt_identity()
 
-    # Check if the post request has the file part
-    if "file" not in request.files:
-        return jsonify({"msg": "No file part"}), 400
+    file = None
+    file_path = None
+    file_size_kb = None
+    content_hash = None
 
-    file = request.files["file"]
-    if file.filename == "":
-        return jsonify({"msg": "No selected file"}), 400
-
-    if file and is_allowed_file(file.filename):
+    if _is_streaming_upload():
+        # Parse the body incrementally, writing the file part directly to storage
         try:
-            # Use file storage service to save the file
-            file_path, file_size_kb = current_app.file_storage.save_uploaded_file(
-                file, current_user_id
+            filename, file_path, file_size_kb, content_hash = (
+                current_app.file_storage.save_streamed_upload(
+                    request.stream,
+                    request.headers,
+                    current_user_id,
+                    is_allowed=is_allowed_file,
+                )
             )
+        except HTTPException:
+            raise
+        except Exception:
+            current_app.logger.exception("Streamed upload failed")
+            return jsonify({"message": "Error creating content"}), 500
+
+        if filename is None:
+            return jsonify({"msg": "No file part"}), 400
+        if filename == "":
+            return jsonify({"msg": "No selected file"}), 400
+        if file_path is None:
+            return jsonify({"msg": "File type not allowed"}), 400
+    else:
+        # Check if the post request has the file part
+        if "file" not in request.files:
+            return jsonify({"msg": "No file part"}), 400
 
-            # Generate thumbnail if the file is an image
-            thumbnail_path = None
-            if current_app.thumbnail_service.is_supported_file(file_path):
-                thumbnail_path = (
-                    current_app.thumbnail_service.generate_and_save_thumbnail_from_path(
-                        file_path
-                    )
+        file = request.files["file"]
+        if file.filename == "":
+            return jsonify({"msg": "No selected file"}), 400
+
+        if not is_allowed_file(file.filename):
+            return jsonify({"msg": "File type not allowed"}), 400
+
+    try:
+        if file_path is None:
+            # Save the file, hashing it in the same pass
+            file_path, file_size_kb, content_hash = (
+                current_app.file_storage.save_uploaded_file_with_hash(
+                    file, current_user_id
                 )
+            )
 
-            # Create new content record WITHOUT embedding
-            new_content = Content(
-                content_path=file_path,
-                content_tag=True,
-                user_id=current_user_id,
-                embedding=None,
-                content_size=file_size_kb,
-                thumbnail_path=thumbnail_path,
+        # Return the existing content if this user already uploaded the same file
+        duplicate = Content.query.filter_by(
+            user_id=current_user_id, content_hash=content_hash
+        ).first()
+        if duplicate:
+            # The upload is already stored, drop the extra copy
+            current_app.file_storage.delete_file(file_path)
+
+            return (
+                jsonify(
+                    {
+                        "message": "Content already exists",
+                        "content": {
+                            "id": duplicate.id,
+                            "content_path": duplicate.content_path,
+                            "content_tag": duplicate.content_tag,
+                            "content_size": duplicate.content_size,
+                            "upload_date": duplicate.upload_date,
+                            "thumbnail_url": (
+                                f"/api/contents/thumbnail/{duplicate.id}"
+                                if duplicate.thumbnail_path
+                                else None
+                            ),
+                        },
+                        "content_id": duplicate.id,
+                        "task_id": None,
+                    }
+                ),
+                200,
+            )
+
+        # Images get a thumbnail, generated once the content is committed
+        thumbnail_path = None
+        if current_app.thumbnail_service.is_supported_file(file_path):
+            thumbnail_path = current_app.thumbnail_service.generate_thumbnail_path(
+                file_path
             )
-            db.session.add(new_content)
-            db.session.commit()
 
+        # Copy the embedding of an identical file instead of recomputing it
+        new_embedding = None
+        existing_embedding = (
+            db.session.query(Embedding)
+            .join(Content, Content.embedding_id == Embedding.id)
+            .filter(Content.content_hash == content_hash)
+            .first()
+        )
+        if existing_embedding:
+            new_embedding = Embedding(
+                vector=existing_embedding.vector,
+                model_id=existing_embedding.model_id,
+                modality=existing_embedding.modality,
+            )
+
+        # Create new content record, WITHOUT embedding unless one was copied
+        new_content = Content(
+            content_path=file_path,
+            content_tag=True,
+            user_id=current_user_id,
+            embedding=new_embedding,
+            content_size=file_size_kb,
+            thumbnail_path=thumbnail_path,
+            content_hash=content_hash,
+        )
+        db.session.add(new_content)
+        db.session.commit()
+        current_app.query_cache.invalidate_user(current_user_id)
+
+        if thumbnail_path is not None:
+            # Saved at thumbnail_path in the background; the content's
+            # thumbnail_path is cleared if generation fails
+            current_app.thumbnail_service.schedule_thumbnail(
+                file_path, content_id=new_content.id
+            )
+
+        task_id = None
+        if new_embedding is None:
             # Schedule the Celery task for processing the file
             from smse_backend.services.embedding import schedule_embedding_task
-            from smse_backend.models.task import Task
 
             task_id = schedule_embedding_task(
                 current_app.file_storage.get_full_path(file_path), new_content.id
@@ -74,42 +176,68 @@ def create_content():
             db.session.add(new_task)
             db.session.commit()
 
-            return (
-                jsonify(
-                    {
-                        "message": "Content created successfully",
-                        "content": {
-                            "id": new_content.id,
-                            "content_path": new_content.content_path,
-                            "content_tag": new_content.content_tag,
-                            "content_size": new_content.content_size,
-                            "upload_date": new_content.upload_date,
-                            "thumbnail_url": (
-                                f"/api/contents/thumbnail/{new_content.id}"
-                                if new_content.thumbnail_path
-                                else None
-                            ),
-                        },
-                        "task_id": task_id,
-                    }
-                ),
-                201,
-            )
-
-        except Exception as e:
-            db.session.rollback()
-            print(e)
-            return jsonify({"message": "Error creating content"}), 500
+        return (
+            jsonify(
+                {
+                    "message": "Content created successfully",
+                    "content": {
+                        "id": new_content.id,
+                        "content_path": new_content.content_path,
+                        "content_tag": new_content.content_tag,
+                        "content_size": new_content.content_size,
+                        "upload_date": new_content.upload_date,
+                        "thumbnail_url": (
+                            f"/api/contents/thumbnail/{new_content.id}"
+                            if new_content.thumbnail_path
+                            else None
+                        ),
+                    },
+                    "content_id": new_content.id,
+                    "task_id": task_id,
+                }
+            ),
+            202 if task_id else 201,
+        )
 
-    return jsonify({"msg": "File type not allowed"}), 400
+    except Exception as e:
+        db.session.rollback()
+        print(e)
+        return jsonify({"message": "Error creating content"}), 500
 
 
 @content_bp.route("/contents", methods=["GET"])
 @jwt_required()
 def get_all_contents():
-    # TODO: Implement pagination
     current_user_id = get_jwt_identity()
-    contents = Content.query.filter_by(user_id=current_user_id).all()
+
+    # Keyset pagination is opt-in; without a limit every content is returned
+    limit = request.args.get("limit", type=int)
+    after_id = request.args.get("after_id", type=int)
+
+    contents_query = (
+        db.session.query(
+            Content.id,
+            Content.content_path,
+            Content.content_tag,
+            Content.content_size,
+            Content.upload_date,
+            Content.thumbnail_path,
+        )
+        .filter_by(user_id=current_user_id)
+        .order_by(Content.id)
+    )
+
+    if after_id is not None:
+        contents_query = contents_query.filter(Content.id > after_id)
+
+    has_more = False
+    if limit is not None:
+        # Fetch one extra row to tell whether another page exists
+        contents = contents_query.limit(limit + 1).all()
+        has_more = len(contents) > limit
+        contents = contents[:limit]
+    else:
+        contents = contents_query.all()
 
     return (
         jsonify(
@@ -128,7 +256,14 @@ def get_all_contents():
                         ),
                     }
                     for content in contents
-                ]
+                ],
+                "pagination": {
+                    "limit": limit,
+                    "has_more": has_more,
+                    "next_cursor": (
+                        {"after_id": contents[-1].id} if has_more else None
+                    ),
+                },
             }
         ),
         200,
@@ -174,6 +309,52 @@ def get_content(content_id):
     )
 
 
+@content_bp.route("/contents/<int:content_id>/embedding_status", methods=["GET"])
+@jwt_required()
+def get_embedding_status(content_id):
+    """
+    Report the state of the embedding task scheduled for a content upload.
+
+    Args:
+        content_id (int): The ID of the content to check.
+
+    Returns:
+        Response: JSON response containing the embedding status or an error message.
+    """
+    current_user_id = get_jwt_identity()
+    content = Content.query.filter_by(id=content_id, user_id=current_user_id).first()
+
+    if not content:
+        return jsonify({"message": "Content not found"}), 404
+
+    task = (
+        Task.query.filter_by(content_id=content.id)
+        .order_by(Task.created_at.desc(), Task.id.desc())
+        .first()
+    )
+
+    status = "SUCCESS" if content.embedding_id is not None else "PENDING"
+    if task:
+        try:
+            status = AsyncResult(task.task_id).state
+        except Exception as e:
+            current_app.logger.error(f"Error checking task status: {str(e)}")
+            # Fall back to the last status recorded for the task
+            status = task.status
+
+    return (
+        jsonify(
+            {
+                "content_id": content.id,
+                "task_id": task.task_id if task else None,
+                "status": status,
+                "embedded": content.embedding_id is not None,
+            }
+        ),
+        200,
+    )
+
+
 @content_bp.route("/contents/<int:content_id>", methods=["PUT"])
 @jwt_required()
 def update_content(content_id):
@@ -201,6 +382,7 @@ def update_content(content_id):
             ]  # Ensure this is in the correct datetime format
 
         db.session.commit()
+        current_app.query_cache.invalidate_user(current_user_id)
         return (
             jsonify(
                 {
@@ -237,21 +419,20 @@ def delete_content(content_id):
         return jsonify({"message": "Content not found"}), 404
 
     try:
-        # Delete the actual file using file storage service
-        if current_app.file_storage.file_exists(content.content_path):
-            current_app.file_storage.delete_file(content.content_path)
-        else:
-            print("The file does not exist")  # TODO: Log this
-
-        # Delete the thumbnail if it exists
-        if content.thumbnail_path and current_app.file_storage.file_exists(
-            content.thumbnail_path
-        ):
-            current_app.thumbnail_service.delete_thumbnail(content.thumbnail_path)
+        file_paths = [content.content_path]
+        if content.thumbnail_path:
+            file_paths.append(content.thumbnail_path)
 
         # Delete the database record
         db.session.delete(content)
         db.session.commit()
+        current_app.query_cache.invalidate_user(current_user_id)
+
+        # Delete the actual files in the background
+        from smse_backend.services.file_cleanup import schedule_file_deletion
+
+        schedule_file_deletion(file_paths)
+
         return jsonify({"message": "Content deleted successfully"}), 200
 
     except Exception as _:
@@ -267,6 +448,37 @@ def get_allowed_extensions_endpoint():
     return jsonify({"allowed_extensions": get_allowed_extensions()}), 200
 
 
+def _send_local_file(file_path, mimetype):
+    """
+    Stream a file from local storage without reading it into memory.
+
+    Args:
+        file_path (str): The relative path of the file, already authorized
+        mimetype (str): The MIME type to send the file with, if known
+
+    Returns:
+        Response: File response or a 404 error if the file doesn't exist.
+    """
+    if current_app.config["USE_X_ACCEL_REDIRECT"]:
+        # Let the reverse proxy send the file (and answer 404 for missing
+        # ones); the worker only authorizes
+        response = make_response("")
+        response.headers["X-Accel-Redirect"] = (
+            current_app.config["X_ACCEL_REDIRECT_PREFIX"] + file_path
+        )
+        response.headers["Content-Type"] = mimetype or "application/octet-stream"
+        return response
+
+    # Stream straight from disk; send_file's own stat doubles as the
+    # existence check
+    try:
+        return send_file(
+            current_app.file_storage.get_full_path(file_path), mimetype=mimetype
+        )
+    except (FileNotFoundError, IsADirectoryError):
+        return jsonify({"message": "File not found"}), 404
+
+
 @content_bp.route("/contents/download", methods=["GET"])
 @jwt_required()
 def download_content():
@@ -296,17 +508,19 @@ def download_content():
             return jsonify({"message": "Content not found"}), 404
         file_path = content.content_path
 
-    if file_path is not None:
-        if current_app.file_storage.get_first_directory(file_path) != str(
-            current_user_id
-        ):
-            print(
-                current_app.file_storage.get_first_directory(file_path), current_user_id
-            )
-            return jsonify({"message": "Unauthorized access"}), 403
+    # Normalize first so a path like "1/../2/file" can't pass the owner check
+    file_path = posixpath.normpath(file_path.lstrip("/"))
+    owner, _, _ = file_path.partition("/")
+    if not owner.isdigit() or int(owner) != int(current_user_id):
+        return jsonify({"message": "Unauthorized access"}), 403
 
-        if not current_app.file_storage.file_exists(file_path):
-            return jsonify({"message": "File not found"}), 404
+    mimetype = guess_type(file_path)[0]
+
+    if current_app.file_storage.is_local:
+        return _send_local_file(file_path, mimetype)
+
+    if not current_app.file_storage.file_exists(file_path):
+        return jsonify({"message": "File not found"}), 404
 
     # Download file content
     file_content = current_app.file_storage.download_file(file_path)
@@ -316,7 +530,7 @@ def download_content():
     # Create a file-like object from the content
     file_obj = io.BytesIO(file_content)
 
-    return send_file(file_obj, mimetype=guess_type(file_path)[0])
+    return send_file(file_obj, mimetype=mimetype)
 
 
 @content_bp.route("/contents/thumbnail/<int:content_id>", methods=["GET"])
@@ -338,31 +552,41 @@ def get_thumbnail(content_id):
     if not content.thumbnail_path:
         return jsonify({"message": "Thumbnail not available"}), 404
 
-    # Verify thumbnail file exists
-    if not current_app.file_storage.file_exists(content.thumbnail_path):
-        return jsonify({"message": "Thumbnail file not found"}), 404
-
     try:
         # Download thumbnail content
         thumbnail_content = current_app.file_storage.download_file(
             content.thumbnail_path
         )
-        if thumbnail_content is None:
-            return jsonify({"message": "Error downloading thumbnail"}), 500
-
-        # Create a file-like object from the content
-        thumbnail_obj = io.BytesIO(thumbnail_content)
-
-        # Return thumbnail with appropriate MIME type
-        return send_file(
-            thumbnail_obj,
-            mimetype="image/jpeg",
-            as_attachment=False,
-            download_name=f"thumbnail_{content_id}.jpg",
-        )
+        if thumbnail_content is not None:
+            # Return thumbnail with appropriate MIME type
+            return send_file(
+                io.BytesIO(thumbnail_content),
+                mimetype="image/jpeg",
+                as_attachment=False,
+                download_name=f"thumbnail_{content_id}.jpg",
+            )
 
     except Exception as e:
         current_app.logger.error(
             f"Error serving thumbnail for content {content_id}: {e}"
         )
         return jsonify({"message": "Error serving thumbnail"}), 500
+
+    # Thumbnails are generated in the background. Until this one exists, only
+    # the owner gets the original image in its place, and only when it can be
+    # streamed from local storage
+    verify_jwt_in_request(optional=True)
+    current_user_id = get_jwt_identity()
+    if (
+        current_user_id is None
+        or int(current_user_id) != content.user_id
+        or not current_app.file_storage.is_local
+    ):
+        return jsonify({"message": "Thumbnail is being generated"}), 202
+
+    response = make_response(
+        _send_local_file(content.content_path, guess_type(content.content_path)[0])
+    )
+    # Don't let clients keep the stand-in once the thumbnail exists
+    response.headers["Cache-Control"] = "no-store"
+    return response
@@ -1,12 +1,15 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from datetime import datetime
+from sqlalchemy import tuple_
 import os
 
 from smse_backend import db
-from smse_backend.models import Query, SearchRecord, Embedding, Model, Content
+from smse_backend.models import Query, SearchRecord, Embedding
 from smse_backend.services.search import search
 from smse_backend.services.embedding import (
-    generate_query_embedding,
+    schedule_query_embedding_task,
+    collect_query_embedding,
     generate_multipart_embedding,
 )
 from smse_backend.utils.file_extensions import EXTENSION_TO_MODALITY
@@ -32,6 +35,7 @@ def search_files():
     query_modalities = []
     saved_files = []  # Track files for cleanup
     query_content_parts = []
+    file_tasks = []  # Scheduled (filename, task) pairs for file query parts
 
     try:
         # Handle text query (if present)
@@ -44,16 +48,10 @@ def search_files():
             # Form data - might have text along with files
             query_text = request.form.get("query")
 
+        # Schedule the text embedding first so it runs while files are saved
+        text_task = None
         if query_text and query_text.strip():
-            # Generate text embedding
-            text_embedding, text_modality = generate_query_embedding(
-                query_text=query_text
-            )
-            if text_embedding is not None:
-                query_embeddings.append(text_embedding)
-                query_modalities.append(text_modality)
-                query_parts.append("text")
-                query_content_parts.append(query_text)
+            text_task = schedule_query_embedding_task(query_text=query_text)
 
         # Handle file uploads (can be multiple)
         files = request.files.getlist("files") or (
@@ -86,19 +84,32 @@ def search_files():
             )
             saved_files.append(file_path)
 
+            # Schedule the query embedding for this file without waiting for it
+            file_tasks.append(
+                (file.filename, schedule_query_embedding_task(query_file=full_path))
+            )
+
+        if text_task is not None:
+            # Collect the text embedding
+            text_embedding, text_modality = collect_query_embedding(text_task)
+            if text_embedding is not None:
+                query_embeddings.append(text_embedding)
+                query_modalities.append(text_modality)
+                query_parts.append("text")
+                query_content_parts.append(query_text)
+
+        for filename, file_task in file_tasks:
             try:
-                # Generate query embedding for this file
-                file_embedding, file_modality = generate_query_embedding(
-                    query_file=full_path
-                )
+                # Collect the query embedding for this file
+                file_embedding, file_modality = collect_query_embedding(file_task)
                 if file_embedding is not None:
                     query_embeddings.append(file_embedding)
                     query_modalities.append(file_modality)
                     query_parts.append("file")
-                    query_content_parts.append(file.filename)
+                    query_content_parts.append(filename)
             except Exception as e:
                 current_app.logger.error(
-                    f"Error processing query file {file.filename}: {str(e)}"
+                    f"Error processing query file {filename}: {str(e)}"
                 )
                 # Continue processing other files instead of failing completely
                 continue
@@ -142,7 +153,8 @@ def search_files():
 
     try:
         # Get user chosen model
-        model_id = db.session.get(Model, 1).id  # TODO: Allow user to choose model
+        # TODO: Allow user to choose model
+        model_id = current_app.config["DEFAULT_MODEL_ID"]
 
         # Store the query with its embedding
         new_embedding = Embedding(
@@ -159,9 +171,9 @@ def search_files():
             embedding=new_embedding,
         )
         db.session.add(new_query)
-        db.session.commit()
-
-        print(query_modality, query_embedding)
+        # Assign primary keys without committing; the whole write path is
+        # committed once after the search records are stored
+        db.session.flush()
 
         # Perform the search using the embedding with pagination
         search_results = search(
@@ -172,35 +184,31 @@ def search_files():
             search_modalities=modalities,
         )
 
-        # Store search results
-        for result in search_results:
-            content_id = result["content_id"]
-            similarity_score = result["similarity_score"]
-
-            new_search_record = SearchRecord(
-                similarity_score=similarity_score,
-                content_id=content_id,
-                query_id=new_query.id,
-            )
-            db.session.add(new_search_record)
+        # Store search results in a single executemany round-trip
+        db.session.bulk_insert_mappings(
+            SearchRecord,
+            [
+                {
+                    "similarity_score": result["similarity_score"],
+                    "content_id": result["content_id"],
+                    "query_id": new_query.id,
+                }
+                for result in search_results
+            ],
+        )
 
         db.session.commit()
 
-        # Prepare content details for response
-        detailed_results = []
-        for result in search_results:
-            content_id = result["content_id"]
-            content = db.session.get(Content, content_id)
-
-            if content:
-                detailed_results.append(
-                    {
-                        "content_id": content_id,
-                        "content_path": content.content_path,
-                        "content_tag": content.content_tag,
-                        "similarity_score": result["similarity_score"],
-                    }
-                )
+        # Content details come back with the search rows, no lookup per result
+        detailed_results = [
+            {
+                "content_id": result["content_id"],
+                "content_path": result["content_path"],
+                "content_tag": result["content_tag"],
+                "similarity_score": result["similarity_score"],
+            }
+            for result in search_results
+        ]
 
         # Clean up temporary query files after successful search
         for saved_file in saved_files:
@@ -247,18 +255,51 @@ def get_query_history():
     # Get pagination parameters
     limit = int(request.args.get("limit", 10))
     offset = int(request.args.get("offset", 0))
+    before_ts = request.args.get("before_ts")
+    before_id = request.args.get("before_id", type=int)
 
-    # Get paginated queries
-    queries = (
-        Query.query.filter_by(user_id=current_user_id)
-        .order_by(Query.timestamp.desc())
-        .limit(limit)
-        .offset(offset)
-        .all()
+    queries_query = (
+        db.session.query(Query.id, Query.text, Query.timestamp)
+        .filter_by(user_id=current_user_id)
+        .order_by(Query.timestamp.desc(), Query.id.desc())
     )
 
-    # Get total count for pagination
-    total_count = Query.query.filter_by(user_id=current_user_id).count()
+    keyset = before_ts is not None and before_id is not None
+    if keyset:
+        # Seek past the cursor instead of scanning and discarding offset rows
+        try:
+            before_ts = datetime.fromisoformat(before_ts)
+        except ValueError:
+            return jsonify({"message": "Invalid before_ts cursor"}), 400
+
+        queries_query = queries_query.filter(
+            tuple_(Query.timestamp, Query.id) < (before_ts, before_id)
+        )
+    else:
+        queries_query = queries_query.offset(offset)
+
+    # Fetch one extra row to tell whether another page exists without a COUNT
+    queries = queries_query.limit(limit + 1).all()
+    has_more = len(queries) > limit
+    queries = queries[:limit]
+
+    pagination = {
+        "limit": limit,
+        "has_more": has_more,
+        "next_cursor": (
+            {
+                "before_ts": queries[-1].timestamp.isoformat(),
+                "before_id": queries[-1].id,
+            }
+            if has_more
+            else None
+        ),
+    }
+    if request.args.get("with_total", "").lower() in ("1", "true"):
+        pagination["total"] = Query.query.filter_by(user_id=current_user_id).count()
+
+    if not keyset:
+        pagination["offset"] = offset
 
     return (
         jsonify(
@@ -271,12 +312,7 @@ def get_query_history():
                     }
                     for query in queries
                 ],
-                "pagination": {
-                    "total": total_count,
-                    "limit": limit,
-                    "offset": offset,
-                    "has_more": (offset + limit) < total_count,
-                },
+                "pagination": pagination,
             }
         ),
         200,
@@ -1,5 +1,7 @@
 from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import or_
+from sqlalchemy.orm import load_only
 from smse_backend.models import User
 from smse_backend import db
 
@@ -10,7 +12,12 @@ user_bp = Blueprint("user", __name__)
 @jwt_required()
 def get_user():
     current_user_id = get_jwt_identity()
-    user = db.session.get(User, current_user_id)
+    # Only the profile columns; skip the password hash and preferences
+    user = (
+        db.session.query(User.id, User.username, User.email, User.created_at)
+        .filter_by(id=current_user_id)
+        .first()
+    )
 
     if not user:
         return jsonify({"message": "User not found"}), 404
@@ -29,23 +36,40 @@ def get_user():
 @jwt_required()
 def update_user():
     current_user_id = get_jwt_identity()
-    user = db.session.get(User, current_user_id)
+    user = db.session.get(
+        User,
+        current_user_id,
+        options=[load_only(User.id, User.username, User.email, User.created_at)],
+    )
 
     if not user:
         return jsonify({"message": "User not found"}), 404
 
     data = request.get_json()
 
-    if "username" in data and data["username"] != user.username:
-        if User.query.filter_by(username=data["username"]).first():
+    new_username = data.get("username", user.username)
+    new_email = data.get("email", user.email)
+
+    # Check both uniqueness constraints in a single query
+    conflicts = []
+    if new_username != user.username or new_email != user.email:
+        conflicts = (
+            db.session.query(User.username, User.email)
+            .filter(User.id != user.id)
+            .filter(or_(User.username == new_username, User.email == new_email))
+            .all()
+        )
+
+    if new_username != user.username:
+        if any(conflict.username == new_username for conflict in conflicts):
             return jsonify({"message": "Username already exists"}), 400
-        user.username = data["username"]
+        user.username = new_username
 
-    if "email" in data and data["email"] != user.email:
-        if User.query.filter_by(email=data["email"]).first():
+    if new_email != user.email:
+        if any(conflict.email == new_email for conflict in conflicts):
             return jsonify({"message": "Email already exists"}), 400
         try:
-            user.email = data["email"]
+            user.email = new_email
         except ValueError as e:
             return jsonify({"message": str(e)}), 400
 
@@ -77,11 +101,17 @@ def delete_user():
         return jsonify({"message": "User not found"}), 404
 
     try:
+        user_id = user.id
         db.session.delete(user)
         db.session.commit()
+        current_app.query_cache.invalidate_user(user_id)
+
+        # Delete user directory in the background
+        from smse_backend.services.file_cleanup import (
+            schedule_user_directory_deletion,
+        )
 
-        # Delete user directory using file storage service
-        current_app.file_storage.delete_user_directory(user.id)
+        schedule_user_directory_deletion(user_id)
 
         return jsonify({"message": "User deleted successfully"}), 200
     except Exception as _:
@@ -1,12 +1,30 @@
-from smse_backend.tasks import process_file, process_query
+from celery.result import AsyncResult, EagerResult
+from celery.utils import uuid
+from flask import current_app
+from redis.exceptions import RedisError
+from smse_backend.models.embedding import EMBEDDING_DIM
+from smse_backend.utils.ttl_cache import TTLCache
+from smse_backend.tasks import (
+    EMBEDDING_BATCH_KEY,
+    process_file,
+    process_file_batch,
+    process_query,
+)
+from collections import Counter
+import hashlib
+import json
+import os
 import numpy as np
-from typing import List
+from typing import List, NamedTuple, Optional
 
 
 def schedule_embedding_task(file_path: str, content_id: int = None):
     """
     Schedule a Celery task to create an embedding for a file.
 
+    With batching enabled, the job is buffered in Redis and embedded together
+    with other uploads once the batch fills up or its timeout expires.
+
     Args:
         file_path (str): Path to the file
         content_id (int, optional): Content ID if already exists
@@ -14,45 +32,244 @@ def schedule_embedding_task(file_path: str, content_id: int = None):
     Returns:
         str: Task ID
     """
-    # Schedule the Celery task
-    task = process_file.delay(file_path, content_id)
-    return task.id
+    queue = current_app.config["EMBEDDING_QUEUE"]
+    batch_size = current_app.config["EMBEDDING_BATCH_SIZE"]
 
+    if batch_size <= 1 or content_id is None:
+        # Schedule the Celery task on the dedicated embedding queue so bulk
+        # uploads don't hold up latency-sensitive query embeddings
+        task = process_file.apply_async(args=[file_path, content_id], queue=queue)
+        return task.id
 
-def generate_query_embedding(query_text: str = None, query_file: str = None):
+    # The batch task stores this job's result under its own task ID
+    task_id = uuid()
+    pending = current_app.redis.rpush(
+        EMBEDDING_BATCH_KEY,
+        json.dumps(
+            {"file_path": file_path, "content_id": content_id, "task_id": task_id}
+        ),
+    )
+
+    if pending >= batch_size:
+        process_file_batch.apply_async(queue=queue)
+    elif pending == 1:
+        # First job of a new batch, make sure it is flushed within the timeout
+        process_file_batch.apply_async(
+            queue=queue, countdown=current_app.config["EMBEDDING_BATCH_TIMEOUT"]
+        )
+
+    return task_id
+
+
+class EmbeddingsCache:
     """
-    Generate an embedding for a query (synchronously for search operations).
+    Redis cache of query embeddings keyed by a hash of the query content.
+
+    Keys are partitioned by model and embedding dimension, so vectors from
+    different models never mix. The modality is kept in a parallel key.
+
+    An optional in-process cache sits in front of Redis, so queries repeated
+    within one worker skip the Redis round trip as well as the model.
+    """
+
+    def __init__(
+        self,
+        redis_client,
+        model_id: int = 1,
+        ttl: int = 24 * 60 * 60,
+        local_cache: Optional[TTLCache] = None,
+    ):
+        self.redis = redis_client
+        self.prefix = f"emb:{model_id}:{EMBEDDING_DIM}"
+        self.ttl = ttl
+        self.local_cache = local_cache
+
+    def key_for_text(self, query_text: str) -> str:
+        """Build the cache key for a text query, ignoring whitespace differences."""
+        normalized = " ".join(query_text.split())
+        return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
+
+    def key_for_file(self, file_path: str) -> Optional[str]:
+        """Build the cache key for a local query file, or None if it isn't local."""
+        if not os.path.isfile(file_path):
+            return None
+
+        digest = hashlib.sha256()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def get(self, key: str):
+        """
+        Look up a cached embedding.
+
+        Returns:
+            tuple: (np.ndarray, str) - The cached embedding and modality
+            None: On a cache miss or if Redis is unavailable
+        """
+        vector_key = f"{self.prefix}:{key}"
+        if self.local_cache is not None:
+            cached = self.local_cache.get(vector_key)
+            if cached is not None:
+                return cached
+
+        try:
+            vector, modality = self.redis.mget(vector_key, f"{self.prefix}:mod:{key}")
+        except RedisError as e:
+            current_app.logger.warning(f"Embedding cache lookup failed: {str(e)}")
+            return None
+
+        if vector is None or modality is None:
+            return None
+
+        # frombuffer over bytes is read-only, so the shared entry can't be modified
+        cached = np.frombuffer(vector, dtype=np.float32), modality.decode("utf-8")
+        if self.local_cache is not None:
+            self.local_cache.set(vector_key, cached)
+        return cached
+
+    def set(self, key: str, embedding: np.ndarray, modality: str) -> None:
+        """Store an embedding and its modality, ignoring Redis failures."""
+        vector = np.asarray(embedding, dtype=np.float32).tobytes()
+        if self.local_cache is not None:
+            self.local_cache.set(
+                f"{self.prefix}:{key}",
+                (np.frombuffer(vector, dtype=np.float32), modality),
+            )
+
+        try:
+            pipe = self.redis.pipeline()
+            pipe.set(f"{self.prefix}:{key}", vector, ex=self.ttl)
+            pipe.set(f"{self.prefix}:mod:{key}", modality, ex=self.ttl)
+            pipe.execute()
+        except RedisError as e:
+            current_app.logger.warning(f"Embedding cache store failed: {str(e)}")
+
+
+class ScheduledQueryEmbedding(NamedTuple):
+    """A query embedding being computed, or already resolved from the cache."""
+
+    result: AsyncResult
+    cache_key: Optional[str] = None
+
+
+def _get_embeddings_cache():
+    """Get the query embeddings cache, or None if caching is disabled."""
+    ttl = current_app.config["QUERY_EMBEDDING_CACHE_TTL"]
+    if not ttl:
+        return None
+
+    # One in-process cache per app, shared by the caches built per request
+    local_cache = current_app.extensions.get("query_embeddings_local_cache")
+    if local_cache is None:
+        local_cache = current_app.extensions.setdefault(
+            "query_embeddings_local_cache",
+            TTLCache(current_app.config["QUERY_EMBEDDING_LOCAL_CACHE_SIZE"], ttl),
+        )
+
+    return EmbeddingsCache(
+        current_app.redis,
+        model_id=current_app.config["DEFAULT_MODEL_ID"],
+        ttl=ttl,
+        local_cache=local_cache,
+    )
+
+
+def schedule_query_embedding_task(query_text: str = None, query_file: str = None):
+    """
+    Schedule a high priority Celery task to embed a query without waiting for it.
     Either query_text or query_file must be provided.
 
+    Scheduling every part of a multipart query before collecting any result lets
+    the workers embed the parts concurrently instead of one round-trip at a time.
+    Queries already in the embeddings cache are resolved without a task.
+
     Args:
         query_text (str, optional): The text query
         query_file (str, optional): Path to a query file
 
     Returns:
-        tuple: (np.ndarray, str) - The generated embedding vector and modality
-        None: If there was an error
+        ScheduledQueryEmbedding: The scheduled (or cached) embedding
+        None: If neither query_text nor query_file was provided
     """
     if query_text is not None:
-        # Process text query with high priority
-        task = process_query.apply_async(args=[query_text, False, None], priority=10)
-        result = task.get(timeout=80)  # Wait for completion with a timeout
+        args = [query_text, False, None]
+    elif query_file is not None:
+        args = [None, True, query_file]
+    else:
+        return None
 
-        if result.get("status") == "success":
-            return np.array(result.get("embedding")), result.get("modality", "text")
-        return None, None
+    cache = _get_embeddings_cache()
+    cache_key = None
+    if cache is not None:
+        if query_text is not None:
+            cache_key = cache.key_for_text(query_text)
+        else:
+            cache_key = cache.key_for_file(query_file)
 
-    elif query_file is not None:
-        # Process file query with high priority
-        task = process_query.apply_async(args=[None, True, query_file], priority=10)
-        result = task.get(timeout=80)  # Wait for completion with a timeout
+        cached = cache.get(cache_key) if cache_key else None
+        if cached is not None:
+            embedding, modality = cached
+            return ScheduledQueryEmbedding(
+                EagerResult(
+                    uuid(),
+                    {"status": "success", "embedding": embedding, "modality": modality},
+                    "SUCCESS",
+                )
+            )
+
+    return ScheduledQueryEmbedding(
+        process_query.apply_async(args=args, priority=10), cache_key
+    )
 
-        if result.get("status") == "success":
-            return np.array(result.get("embedding")), result.get("modality", "text")
+
+def collect_query_embedding(task):
+    """
+    Wait for a scheduled query embedding task and return its embedding.
+
+    Args:
+        task (ScheduledQueryEmbedding): Value returned by schedule_query_embedding_task
+
+    Returns:
+        tuple: (np.ndarray, str) - The generated embedding vector and modality
+        None: If there was an error
+    """
+    if task is None:
         return None, None
 
+    result = task.result.get(timeout=80)  # Wait for completion with a timeout
+
+    if result.get("status") == "success":
+        embedding = np.asarray(result.get("embedding"), dtype=np.float32)
+        modality = result.get("modality", "text")
+
+        cache = _get_embeddings_cache() if task.cache_key else None
+        if cache is not None:
+            cache.set(task.cache_key, embedding, modality)
+
+        return embedding, modality
     return None, None
 
 
+def generate_query_embedding(query_text: str = None, query_file: str = None):
+    """
+    Generate an embedding for a query (synchronously for search operations).
+    Either query_text or query_file must be provided.
+
+    Args:
+        query_text (str, optional): The text query
+        query_file (str, optional): Path to a query file
+
+    Returns:
+        tuple: (np.ndarray, str) - The generated embedding vector and modality
+        None: If there was an error
+    """
+    return collect_query_embedding(
+        schedule_query_embedding_task(query_text=query_text, query_file=query_file)
+    )
+
+
 def generate_multipart_embedding(embeddings: List[np.ndarray], modalities: List[str]):
     """
     Generate a combined embedding from multiple embeddings by taking their mean.
@@ -69,27 +286,22 @@ def generate_multipart_embedding(embeddings: List[np.ndarray], modalities: List[
         return None, None
 
     try:
-        # Convert to numpy arrays if they aren't already
-        embeddings_array = [np.array(emb) for emb in embeddings]
-
         # Check that all embeddings have the same dimension
-        first_shape = embeddings_array[0].shape
-        for i, emb in enumerate(embeddings_array[1:], 1):
-            if emb.shape != first_shape:
+        first_shape = np.shape(embeddings[0])
+        for i, emb in enumerate(embeddings[1:], 1):
+            if np.shape(emb) != first_shape:
                 raise ValueError(
-                    f"Embedding {i} has shape {emb.shape}, expected {first_shape}"
+                    f"Embedding {i} has shape {np.shape(emb)}, expected {first_shape}"
                 )
 
-        # Compute the mean of all embeddings
-        combined_embedding = np.mean(embeddings_array, axis=0)
+        # Accumulate a running sum in place so no (n, d) stack is allocated
+        combined_embedding = np.array(embeddings[0], dtype=np.float32)
+        for emb in embeddings[1:]:
+            np.add(combined_embedding, emb, out=combined_embedding, casting="unsafe")
+        combined_embedding /= len(embeddings)
 
         # Determine the primary modality (most common, or first if tie)
-        modality_counts = {}
-        for modality in modalities:
-            modality_counts[modality] = modality_counts.get(modality, 0) + 1
-
-        # Get the most common modality
-        primary_modality = max(modality_counts.items(), key=lambda x: x[1])[0]
+        primary_modality = Counter(modalities).most_common(1)[0][0]
 
         return combined_embedding, primary_modality
 
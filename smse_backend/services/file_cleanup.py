@@ -24,3 +24,35 @@ def schedule_cleanup_job():
     }
 
     return cleanup_task
+
+
+def schedule_file_deletion(file_paths):
+    """
+    Schedule a Celery task to delete files from storage.
+
+    Args:
+        file_paths (list): Storage paths/keys of the files to delete
+
+    Returns:
+        str: Task ID
+    """
+    from smse_backend.tasks import delete_files
+
+    task = delete_files.delay(list(file_paths))
+    return task.id
+
+
+def schedule_user_directory_deletion(user_id):
+    """
+    Schedule a Celery task to delete a user's directory.
+
+    Args:
+        user_id (int): ID of the user
+
+    Returns:
+        str: Task ID
+    """
+    from smse_backend.tasks import delete_user_directory
+
+    task = delete_user_directory.delay(user_id)
+    return task.id
@@ -10,28 +10,146 @@ This module provides a centralized interface for file operations including:
 - Support for both local and S3-compatible storage
 """
 
+import asyncio
+import errno
+import hashlib
+import io
+import logging
 import os
 import shutil
-import uuid
+import tempfile
+import threading
+import time
 from abc import ABC, abstractmethod
-from datetime import datetime, timedelta
-from typing import Optional, Tuple, List, Union
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from functools import partial
+from itertools import count, islice, repeat
+from typing import Iterable, Iterator, Optional, Tuple, List, Union
 from werkzeug.datastructures import FileStorage
 from werkzeug.utils import secure_filename
 from flask import current_app
+from smse_backend.utils.ttl_cache import TTLCache
 
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig
     from botocore.exceptions import ClientError
 
     HAS_BOTO3 = True
 except ImportError:
     HAS_BOTO3 = False
 
+try:
+    from streaming_form_data import StreamingFormDataParser
+    from streaming_form_data.targets import FileTarget
+
+    HAS_STREAMING_FORM_DATA = True
+except ImportError:
+    HAS_STREAMING_FORM_DATA = False
+
+# Module logger rather than current_app.logger: it avoids the app-context
+# proxy lookup on every call and also works in cleanup worker threads. It
+# propagates to the "smse_backend" logger that Flask configures for the app.
+logger = logging.getLogger(__name__)
+
+# Sentinel for metadata cache misses, since None caches a missing object
+_NOT_CACHED = object()
+
+
+if HAS_STREAMING_FORM_DATA:
+
+    class HashingFileTarget(FileTarget):
+        """FileTarget that also computes the SHA-256 digest of what it writes."""
+
+        def __init__(self, *args, **kwargs):
+            super().__init__(*args, **kwargs)
+            self.sha256 = hashlib.sha256()
+
+        def on_data_received(self, chunk: bytes):
+            self.sha256.update(chunk)
+            super().on_data_received(chunk)
+
+
+class HashingReader:
+    """
+    Read-only stream wrapper that computes the SHA-256 digest of everything
+    read through it, so a file is hashed in the same pass that saves it.
+
+    It is deliberately not seekable: savers copy through it front to back
+    instead of measuring or rewinding it.
+    """
+
+    def __init__(self, stream):
+        self._stream = stream
+        self.sha256 = hashlib.sha256()
+
+    def read(self, size: int = -1) -> bytes:
+        chunk = self._stream.read(size)
+        self.sha256.update(chunk)
+        return chunk
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return False
+
+
+def uuid7_hex() -> str:
+    """
+    Generate a time-ordered UUID (version 7) as 32 hex characters.
+
+    The leading 48 bits are the Unix time in milliseconds, so names built from
+    it sort by creation time and new files land next to each other in the
+    directory index instead of at random positions. The hex is formatted
+    straight from the integer; no uuid.UUID object is built.
+    """
+    value = (time.time_ns() // 1_000_000) << 80 | int.from_bytes(os.urandom(10), "big")
+    value = (value & ~(0xF << 76)) | (0x7 << 76)  # version 7
+    value = (value & ~(0x3 << 62)) | (0x2 << 62)  # RFC 4122 variant
+    return f"{value:032x}"
+
+
+# Random per-process node for sequential_uuid7_hex, redrawn in forked
+# children so that workers forked from one parent don't share it
+_uuid7_node = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+_uuid7_counter = count()
+
+
+def _reseed_uuid7_node() -> None:
+    global _uuid7_node
+    _uuid7_node = int.from_bytes(os.urandom(8), "big") & ((1 << 62) - 1)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reseed_uuid7_node)
+
+
+def sequential_uuid7_hex() -> str:
+    """
+    Generate a UUID version 7 as 32 hex characters without reading urandom.
+
+    Uniqueness comes from the millisecond timestamp, a 12-bit per-process
+    counter and a 62-bit random node drawn once per process, so no getrandom
+    call is made per name. The result is unique but predictable to anyone who
+    has seen another name from the same process; use uuid7_hex where names
+    must not be guessable.
+    """
+    return (
+        f"{time.time_ns() // 1_000_000:012x}"
+        f"7{next(_uuid7_counter) & 0xFFF:03x}"
+        f"{0x2 << 62 | _uuid7_node:016x}"
+    )
+
 
 class StorageBackend(ABC):
     """Abstract base class for storage backends."""
 
+    # Plain class attribute so hot paths can branch on the backend type with a
+    # single attribute read instead of an isinstance check
+    is_local = False
+
     @abstractmethod
     def save_file(self, file_obj: Union[FileStorage, str], key: str) -> bool:
         """Save a file to storage."""
@@ -52,6 +170,11 @@ class StorageBackend(ABC):
         """List files with a given prefix."""
         pass
 
+    @abstractmethod
+    def iter_files(self, prefix: str) -> Iterator[str]:
+        """Lazily iterate over the files with a given prefix."""
+        pass
+
     @abstractmethod
     def get_file_info(self, key: str) -> Optional[dict]:
         """Get file information."""
@@ -76,17 +199,87 @@ class StorageBackend(ABC):
 class LocalStorageBackend(StorageBackend):
     """Local filesystem storage backend."""
 
+    is_local = True
+
+    # Buffer for copies done in Python; the 16-64 KiB library defaults mean
+    # hundreds of read/write syscall pairs for every megabyte of upload
+    _COPY_BUFSIZE = 1 << 20
+
+    # Upper bound on remembered directories, so many users can't grow it forever
+    _MAX_KNOWN_DIRS = 4096
+
     def __init__(self, base_path: str):
         self.base_path = base_path
+        self._root = os.path.abspath(base_path)
+        # Every path inside the root starts with this, e.g. "/uploads/"
+        self._root_prefix = os.path.join(self._root, "")
+        # Directories already created, so saves into them skip makedirs
+        self._known_dirs = set()
+        self._known_dirs_lock = threading.Lock()
         self._ensure_directory_exists(self.base_path)
 
     def _get_full_path(self, key: str) -> str:
-        """Convert a storage key to a full local path."""
-        return os.path.abspath(os.path.join(self.base_path, key))
+        """Convert a storage key to a full local path within the storage root."""
+        if (
+            key
+            and key[0] not in "/."
+            and key[-1] != "/"
+            and "//" not in key
+            and "/." not in key
+        ):
+            # Relative, no empty segments and no segment starting with ".", so
+            # the key is already normalized and can't escape the root
+            return self._root_prefix + key
+
+        if os.path.isabs(key):
+            full_path = os.path.normpath(key)
+            if self._is_within_root(full_path):
+                # Already a full path, e.g. one handed to a worker task
+                return full_path
+
+        # The root is already absolute, so normalizing the join is enough
+        full_path = os.path.normpath(os.path.join(self._root, key.lstrip("/")))
+
+        # Refuse keys that escape the storage root, e.g. through ".."
+        if not self._is_within_root(full_path):
+            raise ValueError(f"Path {key} is outside the storage root")
+        return full_path
+
+    def _get_trusted_full_path(self, key: str) -> str:
+        """
+        Join a key the service built itself onto the storage root.
+
+        Such keys are made from a user id and secure_filename output, so they
+        can't contain ".." or absolute parts and skip normalization and the
+        containment check. Paths that come from requests must go through
+        _get_full_path instead.
+        """
+        return self._root_prefix + key
+
+    def _is_within_root(self, full_path: str) -> bool:
+        """Check whether a normalized absolute path lies inside the storage root."""
+        return full_path == self._root or full_path.startswith(self._root_prefix)
 
     def _ensure_directory_exists(self, directory_path: str) -> None:
         """Ensure a directory exists, creating it if necessary."""
+        if directory_path in self._known_dirs:
+            return
+
         os.makedirs(directory_path, exist_ok=True)
+        with self._known_dirs_lock:
+            if len(self._known_dirs) >= self._MAX_KNOWN_DIRS:
+                self._known_dirs.clear()
+            self._known_dirs.add(directory_path)
+
+    def _forget_directories(self, directory_path: str) -> None:
+        """Drop a removed directory and everything below it from the cache."""
+        prefix = os.path.join(directory_path, "")
+        with self._known_dirs_lock:
+            self._known_dirs = {
+                known
+                for known in self._known_dirs
+                if known != directory_path and not known.startswith(prefix)
+            }
 
     def save_file(self, file_obj: Union[FileStorage, str], key: str) -> bool:
         """Save a file to local storage."""
@@ -95,28 +288,103 @@ class LocalStorageBackend(StorageBackend):
             self._ensure_directory_exists(os.path.dirname(full_path))
 
             if isinstance(file_obj, FileStorage):
-                file_obj.save(full_path)
+                self._save_upload(file_obj, full_path)
             else:
                 # file_obj is a path to an existing file
-                shutil.copy2(file_obj, full_path)
+                self._copy_local(file_obj, full_path)
             return True
         except Exception as e:
-            current_app.logger.error(f"Error saving file {key}: {str(e)}")
+            logger.error("Error saving file %s: %s", key, e)
             return False
 
+    def _save_upload(self, file: FileStorage, full_path: str) -> None:
+        """
+        Save an uploaded file, copying in the kernel with sendfile when the
+        upload was spooled to a temporary file on disk.
+        """
+        stream = file.stream
+        if isinstance(stream, tempfile.SpooledTemporaryFile):
+            if not stream._rolled:
+                # Small uploads are still in memory, there is no fd to copy from
+                file.save(full_path, buffer_size=self._COPY_BUFSIZE)
+                return
+            stream = stream._file
+
+        try:
+            src_fd = stream.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            file.save(full_path, buffer_size=self._COPY_BUFSIZE)
+            return
+
+        if not hasattr(os, "sendfile"):
+            file.save(full_path, buffer_size=self._COPY_BUFSIZE)
+            return
+
+        stream.flush()
+        start = stream.tell()
+        offset = start
+        remaining = os.fstat(src_fd).st_size - start
+
+        with open(full_path, "wb") as dst:
+            try:
+                # sendfile reads at an explicit offset, the stream position is kept
+                while remaining > 0:
+                    sent = os.sendfile(dst.fileno(), src_fd, offset, remaining)
+                    if sent == 0:
+                        break
+                    offset += sent
+                    remaining -= sent
+            except OSError:
+                # sendfile can't copy between these files, fall back to Python
+                dst.seek(0)
+                dst.truncate()
+                stream.seek(start)
+                shutil.copyfileobj(stream, dst, self._COPY_BUFSIZE)
+
+    def _copy_local(self, source_path: str, dest_path: str) -> None:
+        """
+        Copy a file with copy_file_range, keeping the data in the kernel and
+        letting filesystems like Btrfs and XFS share extents instead of
+        copying them. Falls back to shutil.copy2 where it isn't supported.
+        """
+        if not hasattr(os, "copy_file_range"):
+            shutil.copy2(source_path, dest_path)
+            return
+
+        try:
+            with open(source_path, "rb") as src, open(dest_path, "wb") as dst:
+                while os.copy_file_range(src.fileno(), dst.fileno(), 1 << 30):
+                    pass
+        except OSError as e:
+            if e.errno not in (
+                errno.EXDEV,
+                errno.ENOSYS,
+                errno.EOPNOTSUPP,
+                errno.EINVAL,
+            ):
+                raise
+            # Cross-device or unsupported here, shutil copies with sendfile
+            shutil.copy2(source_path, dest_path)
+            return
+
+        shutil.copystat(source_path, dest_path)
+
     def delete_file(self, key: str) -> bool:
         """Delete a file from local storage."""
         try:
             full_path = self._get_full_path(key)
-            if os.path.exists(full_path):
-                if os.path.isfile(full_path):
-                    os.remove(full_path)
-                elif os.path.isdir(full_path):
-                    shutil.rmtree(full_path)
-                return True
+            # Unlink directly instead of checking first: one syscall, no race
+            try:
+                os.unlink(full_path)
+            except IsADirectoryError:
+                shutil.rmtree(full_path)
+                self._forget_directories(full_path)
+            return True
+        except FileNotFoundError:
+            logger.info("File %s already deleted", key)
             return False
         except Exception as e:
-            current_app.logger.error(f"Error deleting file {key}: {str(e)}")
+            logger.error("Error deleting file %s: %s", key, e)
             return False
 
     def file_exists(self, key: str) -> bool:
@@ -127,36 +395,51 @@ class LocalStorageBackend(StorageBackend):
     def list_files(self, prefix: str) -> List[str]:
         """List files with a given prefix in local storage."""
         try:
-            full_prefix_path = self._get_full_path(prefix)
-            files = []
-
-            if os.path.exists(full_prefix_path):
-                if os.path.isfile(full_prefix_path):
-                    files.append(prefix)
-                else:
-                    for root, _, filenames in os.walk(full_prefix_path):
-                        for filename in filenames:
-                            full_file_path = os.path.join(root, filename)
-                            relative_path = os.path.relpath(
-                                full_file_path, self.base_path
-                            )
-                            files.append(relative_path.replace(os.sep, "/"))
-
-            return files
+            return list(self.iter_files(prefix))
         except Exception as e:
-            current_app.logger.error(
-                f"Error listing files with prefix {prefix}: {str(e)}"
-            )
+            logger.error("Error listing files with prefix %s: %s", prefix, e)
             return []
 
+    def iter_files(self, prefix: str) -> Iterator[str]:
+        """Lazily iterate over the files with a given prefix in local storage."""
+        full_prefix_path = self._get_full_path(prefix)
+        if os.path.isfile(full_prefix_path):
+            yield prefix
+            return
+
+        relative_root = os.path.relpath(full_prefix_path, self.base_path)
+        if relative_root == os.curdir:
+            key_prefix = ""
+        else:
+            key_prefix = relative_root.replace(os.sep, "/") + "/"
+
+        # Walk with scandir and an explicit stack; entries carry their type,
+        # so listing costs no stat per file and keys are built directly
+        # instead of through relpath
+        pending = [(full_prefix_path, key_prefix)]
+        while pending:
+            directory, key_prefix = pending.pop()
+            try:
+                entries = os.scandir(directory)
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append((entry.path, f"{key_prefix}{entry.name}/"))
+                    elif not entry.is_dir():
+                        yield key_prefix + entry.name
+
     def get_file_info(self, key: str) -> Optional[dict]:
         """Get file information from local storage."""
         try:
             full_path = self._get_full_path(key)
-            if not os.path.exists(full_path):
+            try:
+                stat = os.stat(full_path)
+            except FileNotFoundError:
                 return None
 
-            stat = os.stat(full_path)
             return {
                 "key": key,
                 "size": stat.st_size,
@@ -164,7 +447,7 @@ class LocalStorageBackend(StorageBackend):
                 "created": datetime.fromtimestamp(stat.st_ctime),
             }
         except Exception as e:
-            current_app.logger.error(f"Error getting file info for {key}: {str(e)}")
+            logger.error("Error getting file info for %s: %s", key, e)
             return None
 
     def copy_file(self, source_key: str, dest_key: str) -> bool:
@@ -173,15 +456,14 @@ class LocalStorageBackend(StorageBackend):
             source_path = self._get_full_path(source_key)
             dest_path = self._get_full_path(dest_key)
 
-            if not os.path.exists(source_path):
-                return False
-
             self._ensure_directory_exists(os.path.dirname(dest_path))
-            shutil.copy2(source_path, dest_path)
+            self._copy_local(source_path, dest_path)
             return True
+        except FileNotFoundError:
+            return False
         except Exception as e:
-            current_app.logger.error(
-                f"Error copying file from {source_key} to {dest_key}: {str(e)}"
+            logger.error(
+                "Error copying file from %s to %s: %s", source_key, dest_key, e
             )
             return False
 
@@ -191,35 +473,48 @@ class LocalStorageBackend(StorageBackend):
             old_path = self._get_full_path(old_key)
             new_path = self._get_full_path(new_key)
 
-            if not os.path.exists(old_path):
-                return False
-
             self._ensure_directory_exists(os.path.dirname(new_path))
-            shutil.move(old_path, new_path)
+            try:
+                # Within one filesystem a move is a single atomic rename
+                os.replace(old_path, new_path)
+            except OSError as e:
+                if e.errno != errno.EXDEV:
+                    raise
+                # The upload folder spans filesystems, copy and delete instead
+                shutil.move(old_path, new_path)
             return True
+        except FileNotFoundError:
+            return False
         except Exception as e:
-            current_app.logger.error(
-                f"Error moving file from {old_key} to {new_key}: {str(e)}"
-            )
+            logger.error("Error moving file from %s to %s: %s", old_key, new_key, e)
             return False
 
     def download_file(self, key: str) -> Optional[bytes]:
         """Download a file and return its content as bytes."""
         try:
             full_path = self._get_full_path(key)
-            if not os.path.exists(full_path):
-                return None
-
             with open(full_path, "rb") as f:
                 return f.read()
+        except FileNotFoundError:
+            return None
         except Exception as e:
-            current_app.logger.error(f"Error downloading file {key}: {str(e)}")
+            logger.error("Error downloading file %s: %s", key, e)
             return None
 
 
 class S3StorageBackend(StorageBackend):
     """S3-compatible storage backend using boto3."""
 
+    # Files below this size are sent with a single PutObject; the transfer
+    # manager's threads and multipart bookkeeping only pay off for large files
+    _PUT_OBJECT_MAX_SIZE = 5 * 1024 * 1024
+    _MULTIPART_THRESHOLD = 8 * 1024 * 1024
+    _MULTIPART_CHUNKSIZE = 50 * 1024 * 1024
+    _MAX_CONCURRENCY = 10
+    # Objects above this size are copied server-side in concurrent parts
+    # (UploadPartCopy); CopyObject is one serial request and stops at 5 GB
+    _MULTIPART_COPY_THRESHOLD = 100 * 1024 * 1024
+
     def __init__(
         self,
         bucket_name: str,
@@ -228,6 +523,8 @@ class S3StorageBackend(StorageBackend):
         secret_key: str,
         region_name: str = "us-east-1",
         use_ssl: bool = True,
+        metadata_cache_size: int = 10000,
+        metadata_cache_ttl: float = 5.0,
     ):
         if not HAS_BOTO3:
             raise ImportError("boto3 is required for S3 storage backend")
@@ -241,26 +538,39 @@ class S3StorageBackend(StorageBackend):
             region_name=region_name,
             use_ssl=use_ssl,
         )
+        # Large uploads are split into parts that are sent concurrently
+        self._transfer_config = TransferConfig(
+            multipart_threshold=self._MULTIPART_THRESHOLD,
+            multipart_chunksize=self._MULTIPART_CHUNKSIZE,
+            max_concurrency=self._MAX_CONCURRENCY,
+            use_threads=True,
+        )
+        self._copy_transfer_config = TransferConfig(
+            multipart_threshold=self._MULTIPART_COPY_THRESHOLD,
+            multipart_chunksize=self._MULTIPART_CHUNKSIZE,
+            max_concurrency=self._MAX_CONCURRENCY,
+            use_threads=True,
+        )
+        # HEAD results by key: the info dict for objects that exist, None for
+        # ones that don't. Writes through this backend invalidate their keys;
+        # the short TTL bounds staleness from writes made by other processes.
+        self._metadata_cache = TTLCache(metadata_cache_size, metadata_cache_ttl)
         self._ensure_bucket_exists()
 
     def _ensure_bucket_exists(self) -> None:
         """Ensure the S3 bucket exists, create it if not."""
         try:
             self.s3_client.head_bucket(Bucket=self.bucket_name)
-            current_app.logger.info(f"S3 bucket {self.bucket_name} already exists")
+            logger.info("S3 bucket %s already exists", self.bucket_name)
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
-            current_app.logger.info(
-                f"Bucket check failed with error code: {error_code}"
-            )
+            logger.info("Bucket check failed with error code: %s", error_code)
 
             # Handle both 404 (NoSuchBucket) and 403 (Forbidden) as bucket doesn't exist
             # MinIO can return 403 when bucket doesn't exist depending on configuration
             if error_code in ["404", "NoSuchBucket", "403", "Forbidden"]:
                 try:
-                    current_app.logger.info(
-                        f"Attempting to create bucket: {self.bucket_name}"
-                    )
+                    logger.info("Attempting to create bucket: %s", self.bucket_name)
 
                     # Create bucket with proper configuration
                     region = getattr(
@@ -276,39 +586,38 @@ class S3StorageBackend(StorageBackend):
                             CreateBucketConfiguration={"LocationConstraint": region},
                         )
 
-                    current_app.logger.info(
-                        f"Successfully created S3 bucket: {self.bucket_name}"
-                    )
+                    logger.info("Successfully created S3 bucket: %s", self.bucket_name)
 
                     # Verify bucket was created by trying to access it again
                     try:
                         self.s3_client.head_bucket(Bucket=self.bucket_name)
-                        current_app.logger.info(
-                            f"Verified bucket {self.bucket_name} is accessible"
+                        logger.info(
+                            "Verified bucket %s is accessible", self.bucket_name
                         )
                     except ClientError as verify_error:
-                        current_app.logger.warning(
-                            f"Bucket created but verification failed: {str(verify_error)}"
+                        logger.warning(
+                            "Bucket created but verification failed: %s", verify_error
                         )
 
                 except ClientError as create_error:
                     error_code = create_error.response["Error"]["Code"]
                     if error_code == "BucketAlreadyExists":
-                        current_app.logger.info(
-                            f"Bucket {self.bucket_name} already exists (race condition)"
+                        logger.info(
+                            "Bucket %s already exists (race condition)",
+                            self.bucket_name,
                         )
                     elif error_code == "BucketAlreadyOwnedByYou":
-                        current_app.logger.info(
-                            f"Bucket {self.bucket_name} already owned by you"
-                        )
+                        logger.info("Bucket %s already owned by you", self.bucket_name)
                     else:
-                        current_app.logger.error(
-                            f"Error creating bucket {self.bucket_name}: {str(create_error)}"
+                        logger.error(
+                            "Error creating bucket %s: %s",
+                            self.bucket_name,
+                            create_error,
                         )
                         raise
             else:
-                current_app.logger.error(
-                    f"Unexpected error accessing bucket {self.bucket_name}: {str(e)}"
+                logger.error(
+                    "Unexpected error accessing bucket %s: %s", self.bucket_name, e
                 )
                 raise
 
@@ -316,14 +625,66 @@ class S3StorageBackend(StorageBackend):
         """Save a file to S3 storage."""
         try:
             if isinstance(file_obj, FileStorage):
-                self.s3_client.upload_fileobj(file_obj.stream, self.bucket_name, key)
+                stream = file_obj.stream
+                if getattr(stream, "seekable", lambda: True)():
+                    position = stream.tell()
+                    size = stream.seek(0, os.SEEK_END) - position
+                    stream.seek(position)
+                else:
+                    # Unknown size; the managed upload still sends small
+                    # streams with a single PUT
+                    size = None
+
+                if size is not None and size < self._PUT_OBJECT_MAX_SIZE:
+                    self.s3_client.put_object(
+                        Bucket=self.bucket_name, Key=key, Body=stream.read()
+                    )
+                else:
+                    self.s3_client.upload_fileobj(
+                        stream, self.bucket_name, key, Config=self._transfer_config
+                    )
             else:
                 # file_obj is a path to an existing file
-                self.s3_client.upload_file(file_obj, self.bucket_name, key)
+                if os.path.getsize(file_obj) < self._PUT_OBJECT_MAX_SIZE:
+                    with open(file_obj, "rb") as f:
+                        self.s3_client.put_object(
+                            Bucket=self.bucket_name, Key=key, Body=f
+                        )
+                else:
+                    self.s3_client.upload_file(
+                        file_obj, self.bucket_name, key, Config=self._transfer_config
+                    )
+            return True
+        except Exception as e:
+            logger.error("Error saving file %s to S3: %s", key, e)
+            return False
+        finally:
+            self._metadata_cache.discard(key)
+
+    def save_bytes(
+        self,
+        data: bytes,
+        key: str,
+        content_type: Optional[str] = None,
+        cache_control: Optional[str] = None,
+    ) -> bool:
+        """Save in-memory data to S3 storage with a single PUT request."""
+        extra_args = {}
+        if content_type:
+            extra_args["ContentType"] = content_type
+        if cache_control:
+            extra_args["CacheControl"] = cache_control
+
+        try:
+            self.s3_client.put_object(
+                Bucket=self.bucket_name, Key=key, Body=data, **extra_args
+            )
             return True
         except Exception as e:
-            current_app.logger.error(f"Error saving file {key} to S3: {str(e)}")
+            logger.error("Error saving file %s to S3: %s", key, e)
             return False
+        finally:
+            self._metadata_cache.discard(key)
 
     def delete_file(self, key: str) -> bool:
         """Delete a file from S3 storage."""
@@ -331,74 +692,167 @@ class S3StorageBackend(StorageBackend):
             self.s3_client.delete_object(Bucket=self.bucket_name, Key=key)
             return True
         except Exception as e:
-            current_app.logger.error(f"Error deleting file {key} from S3: {str(e)}")
+            logger.error("Error deleting file %s from S3: %s", key, e)
             return False
+        finally:
+            self._metadata_cache.discard(key)
+
+    def _head(self, key: str) -> Optional[dict]:
+        """
+        Get an object's info with a HEAD request, answering from the metadata
+        cache when the key was looked up recently.
+
+        Returns:
+            The file info dict, or None if the object doesn't exist
+        """
+        info = self._metadata_cache.get(key, _NOT_CACHED)
+        if info is not _NOT_CACHED:
+            return info
+
+        try:
+            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "NotFound"):
+                self._metadata_cache.set(key, None)
+            return None
+
+        info = {
+            "key": key,
+            "size": response["ContentLength"],
+            "last_modified": response["LastModified"],
+            "etag": response["ETag"].strip('"'),
+        }
+        self._metadata_cache.set(key, info)
+        return info
 
     def file_exists(self, key: str) -> bool:
         """Check if a file exists in S3 storage."""
         try:
-            self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
-            return True
-        except ClientError:
-            return False
+            return self._head(key) is not None
         except Exception as e:
-            current_app.logger.error(
-                f"Error checking if file {key} exists in S3: {str(e)}"
-            )
+            logger.error("Error checking if file %s exists in S3: %s", key, e)
             return False
 
     def list_files(self, prefix: str) -> List[str]:
         """List files with a given prefix in S3 storage."""
         try:
-            response = self.s3_client.list_objects_v2(
-                Bucket=self.bucket_name, Prefix=prefix
-            )
-
-            files = []
-            if "Contents" in response:
-                files = [obj["Key"] for obj in response["Contents"]]
-
-            return files
+            return list(self.iter_files(prefix))
         except Exception as e:
-            current_app.logger.error(
-                f"Error listing files with prefix {prefix} in S3: {str(e)}"
-            )
+            logger.error("Error listing files with prefix %s in S3: %s", prefix, e)
             return []
 
+    def iter_files(self, prefix: str) -> Iterator[str]:
+        """Lazily iterate over the files with a given prefix in S3 storage."""
+        # Every page, not just the first 1000 keys of a single request; pages
+        # are fetched as the iteration reaches them
+        for key, _, _ in self.list_files_with_metadata(prefix):
+            yield key
+
+    def list_files_with_metadata(
+        self, prefix: str
+    ) -> Iterator[Tuple[str, datetime, int]]:
+        """
+        Yield (key, last_modified, size) for every object under a prefix.
+
+        The metadata comes straight from the ListObjectsV2 pages, so callers
+        that filter by age or size need no HEAD request per object.
+        """
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                yield obj["Key"], obj["LastModified"], obj["Size"]
+
+    def list_prefixes(self, prefix: str = "") -> Iterator[str]:
+        """Yield the common prefixes one "/" level below a prefix."""
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(
+            Bucket=self.bucket_name, Prefix=prefix, Delimiter="/"
+        ):
+            for common_prefix in page.get("CommonPrefixes", []):
+                yield common_prefix["Prefix"]
+
+    def delete_files(self, keys: Iterable[str]) -> Tuple[int, int]:
+        """
+        Delete several objects with batched DeleteObjects requests.
+
+        Keys are consumed lazily, one batch at a time, so a generator over a
+        listing never has to be held in memory as a whole.
+
+        Returns:
+            Tuple of (deleted, failed) object counts
+        """
+        deleted = 0
+        failed = 0
+        keys = iter(keys)
+        # DeleteObjects accepts at most 1000 keys per request
+        while batch := list(islice(keys, 1000)):
+            self._metadata_cache.discard(*batch)
+            try:
+                response = self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={"Objects": [{"Key": key} for key in batch], "Quiet": True},
+                )
+            except Exception as e:
+                logger.error("Error deleting %d files from S3: %s", len(batch), e)
+                failed += len(batch)
+                continue
+
+            errors = response.get("Errors", [])
+            for error in errors:
+                logger.error(
+                    "Error deleting file %s from S3: %s",
+                    error.get("Key"),
+                    error.get("Message"),
+                )
+            deleted += len(batch) - len(errors)
+            failed += len(errors)
+
+        return deleted, failed
+
     def get_file_info(self, key: str) -> Optional[dict]:
         """Get file information from S3 storage."""
         try:
-            response = self.s3_client.head_object(Bucket=self.bucket_name, Key=key)
-            return {
-                "key": key,
-                "size": response["ContentLength"],
-                "last_modified": response["LastModified"],
-                "etag": response["ETag"].strip('"'),
-            }
-        except ClientError:
-            return None
+            info = self._head(key)
+            # Copy so callers can't modify the cached entry
+            return dict(info) if info is not None else None
         except Exception as e:
-            current_app.logger.error(
-                f"Error getting file info for {key} from S3: {str(e)}"
-            )
+            logger.error("Error getting file info for %s from S3: %s", key, e)
             return None
 
     def copy_file(self, source_key: str, dest_key: str) -> bool:
         """Copy a file within S3 storage."""
         try:
             copy_source = {"Bucket": self.bucket_name, "Key": source_key}
-            self.s3_client.copy_object(
-                CopySource=copy_source, Bucket=self.bucket_name, Key=dest_key
-            )
+            source_info = self._head(source_key)
+            if (
+                source_info is not None
+                and source_info["size"] > self._MULTIPART_COPY_THRESHOLD
+            ):
+                self.s3_client.copy(
+                    copy_source,
+                    self.bucket_name,
+                    dest_key,
+                    Config=self._copy_transfer_config,
+                )
+            else:
+                self.s3_client.copy_object(
+                    CopySource=copy_source, Bucket=self.bucket_name, Key=dest_key
+                )
             return True
         except Exception as e:
-            current_app.logger.error(
-                f"Error copying file from {source_key} to {dest_key} in S3: {str(e)}"
+            logger.error(
+                "Error copying file from %s to %s in S3: %s", source_key, dest_key, e
             )
             return False
+        finally:
+            self._metadata_cache.discard(dest_key)
 
     def move_file(self, old_key: str, new_key: str) -> bool:
         """Move a file within S3 storage."""
+        if old_key == new_key:
+            # Nothing to copy, and deleting the source would lose the file
+            return self.file_exists(old_key)
+
         try:
             # Copy the file to the new location
             if self.copy_file(old_key, new_key):
@@ -406,8 +860,8 @@ class S3StorageBackend(StorageBackend):
                 return self.delete_file(old_key)
             return False
         except Exception as e:
-            current_app.logger.error(
-                f"Error moving file from {old_key} to {new_key} in S3: {str(e)}"
+            logger.error(
+                "Error moving file from %s to %s in S3: %s", old_key, new_key, e
             )
             return False
 
@@ -419,52 +873,83 @@ class S3StorageBackend(StorageBackend):
         except ClientError as e:
             error_code = e.response["Error"]["Code"]
             if error_code == "NoSuchKey":
-                current_app.logger.info(f"File {key} not found in S3")
+                logger.info("File %s not found in S3", key)
                 return None
             else:
-                current_app.logger.error(
-                    f"Error downloading file {key} from S3: {str(e)}"
-                )
+                logger.error("Error downloading file %s from S3: %s", key, e)
                 return None
         except Exception as e:
-            current_app.logger.error(f"Error downloading file {key} from S3: {str(e)}")
+            logger.error("Error downloading file %s from S3: %s", key, e)
             return None
 
 
 class FileStorageService:
     """Centralized file storage service for the SMSE backend."""
 
-    def __init__(self):
+    # Below this many files a tree is unlinked serially; a thread pool only
+    # pays for itself once there are enough unlinks to overlap
+    _PARALLEL_RMTREE_MIN_FILES = 256
+
+    def __init__(self, app=None):
         """Initialize the file storage service."""
         self._backend = None
+        self._config = None
+        self._executor = None
+        self._executor_lock = threading.Lock()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app) -> None:
+        """
+        Bind the service to an app and register it in app.extensions.
+
+        Settings are then read from that app's config directly, without
+        going through the current_app proxy, which also lets the service be
+        used from threads that have no app context.
+        """
+        self._config = app.config
+        app.extensions["file_storage"] = self
+
+    @property
+    def config(self):
+        """Config of the bound app, or of the current app when unbound."""
+        return self._config if self._config is not None else current_app.config
 
     @property
     def backend(self) -> StorageBackend:
         """Get the storage backend instance."""
         if self._backend is None:
-            storage_type = current_app.config.get("STORAGE_TYPE", "local")
+            config = self.config
+            storage_type = config.get("STORAGE_TYPE", "local")
 
             if storage_type == "local":
-                upload_folder = current_app.config["UPLOAD_FOLDER"]
+                upload_folder = config["UPLOAD_FOLDER"]
                 self._backend = LocalStorageBackend(upload_folder)
             elif storage_type == "s3":
                 self._backend = S3StorageBackend(
-                    bucket_name=current_app.config["S3_BUCKET_NAME"],
-                    endpoint_url=current_app.config["S3_ENDPOINT_URL"],
-                    access_key=current_app.config["S3_ACCESS_KEY_ID"],
-                    secret_key=current_app.config["S3_SECRET_KEY"],
-                    region_name=current_app.config["S3_REGION_NAME"],
-                    use_ssl=current_app.config["S3_USE_SSL"],
+                    bucket_name=config["S3_BUCKET_NAME"],
+                    endpoint_url=config["S3_ENDPOINT_URL"],
+                    access_key=config["S3_ACCESS_KEY_ID"],
+                    secret_key=config["S3_SECRET_KEY"],
+                    region_name=config["S3_REGION_NAME"],
+                    use_ssl=config["S3_USE_SSL"],
+                    metadata_cache_size=config["S3_METADATA_CACHE_SIZE"],
+                    metadata_cache_ttl=config["S3_METADATA_CACHE_TTL"],
                 )
             else:
                 raise ValueError(f"Unsupported storage type: {storage_type}")
 
         return self._backend
 
+    @property
+    def is_local(self) -> bool:
+        """Whether files are stored on the local filesystem."""
+        return self.backend.is_local
+
     @property
     def upload_folder(self) -> str:
         """Get the upload folder path (for backward compatibility)."""
-        return current_app.config["UPLOAD_FOLDER"]
+        return self.config["UPLOAD_FOLDER"]
 
     def get_full_path(self, relative_path: str) -> str:
         """
@@ -478,7 +963,7 @@ class FileStorageService:
         Returns:
             Absolute path to the file (local) or key (S3)
         """
-        if isinstance(self.backend, LocalStorageBackend):
+        if self.backend.is_local:
             return self.backend._get_full_path(relative_path)
         else:
             # For S3, return the key as-is
@@ -492,7 +977,7 @@ class FileStorageService:
         Args:
             directory_path: Path to the directory to create
         """
-        if isinstance(self.backend, LocalStorageBackend):
+        if self.backend.is_local:
             self.backend._ensure_directory_exists(directory_path)
         # For S3, directories don't need to be explicitly created
 
@@ -505,10 +990,13 @@ class FileStorageService:
             prefix: Optional prefix to add to the filename
 
         Returns:
-            Unique filename with UUID prefix
+            Unique filename with a time-ordered UUID prefix
         """
         secure_name = secure_filename(original_filename)
-        uuid_prefix = uuid.uuid4().hex
+        if self.config["UNGUESSABLE_FILENAMES"]:
+            uuid_prefix = uuid7_hex()
+        else:
+            uuid_prefix = sequential_uuid7_hex()
 
         if prefix:
             return f"{uuid_prefix}_{prefix}_{secure_name}"
@@ -525,12 +1013,41 @@ class FileStorageService:
             Tuple of (size_in_bytes, size_in_kb)
         """
         file_stream = file.stream
-        file_stream.seek(0, os.SEEK_END)
-        size_bytes = file_stream.tell()
-        file_stream.seek(0)  # Reset stream position
+        if isinstance(file_stream, tempfile.SpooledTemporaryFile):
+            # Look at the underlying file: asking the spool itself for an fd
+            # would roll an in-memory upload over to disk
+            file_stream = file_stream._file
+
+        try:
+            # One fstat instead of seeking to the end of the upload and back
+            file_stream.flush()
+            size_bytes = os.fstat(file_stream.fileno()).st_size
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            file_stream = file.stream
+            file_stream.seek(0, os.SEEK_END)
+            size_bytes = file_stream.tell()
+            file_stream.seek(0)  # Reset stream position
         size_kb = round(size_bytes / 1024, 2)
         return size_bytes, size_kb
 
+    def get_file_hash(self, file: FileStorage) -> str:
+        """
+        Compute the SHA-256 digest of an uploaded file.
+
+        Args:
+            file: Uploaded file object
+
+        Returns:
+            Hex digest of the file content; the stream is left at the start
+        """
+        digest = hashlib.sha256()
+        file_stream = file.stream
+        file_stream.seek(0)
+        for chunk in iter(lambda: file_stream.read(1024 * 1024), b""):
+            digest.update(chunk)
+        file_stream.seek(0)  # Reset stream position
+        return digest.hexdigest()
+
     def save_uploaded_file(
         self,
         file: FileStorage,
@@ -550,24 +1067,172 @@ class FileStorageService:
         Returns:
             Tuple of (relative_file_path, file_size_kb)
         """
-        # Generate unique filename
-        unique_filename = self.generate_unique_filename(file.filename, filename_prefix)
+        relative_path, size_kb, _, _ = self._save_uploaded_file(
+            file, user_id, subdirectory, filename_prefix
+        )
+        return relative_path, size_kb
 
-        # Build relative path/key
-        if subdirectory:
-            relative_path = f"{user_id}/{subdirectory}/{unique_filename}"
-        else:
-            relative_path = f"{user_id}/{unique_filename}"
+    def save_uploaded_file_with_hash(
+        self,
+        file: FileStorage,
+        user_id: int,
+        subdirectory: Optional[str] = None,
+        filename_prefix: str = "",
+    ) -> Tuple[str, float, str]:
+        """
+        Save an uploaded file to the user's directory, hashing it as it is
+        written.
 
-        # Get file size before saving
-        _, size_kb = self.get_file_size_info(file)
+        The upload is read once, through the hash, instead of once to hash it
+        and again to save it. Local saves copy it in Python rather than with
+        sendfile, since the data has to pass through the hash anyway.
+
+        Args:
+            file: Uploaded file object
+            user_id: ID of the user uploading the file
+            subdirectory: Optional subdirectory within user folder
+            filename_prefix: Optional prefix for the filename
+
+        Returns:
+            Tuple of (relative_file_path, file_size_kb, content_hash), the
+            hash being the SHA-256 hex digest of the file content
+        """
+        relative_path, size_kb, _, content_hash = self._save_uploaded_file(
+            file, user_id, subdirectory, filename_prefix, hash_content=True
+        )
+        return relative_path, size_kb, content_hash
+
+    def _save_uploaded_file(
+        self,
+        file: FileStorage,
+        user_id: int,
+        subdirectory: Optional[str] = None,
+        filename_prefix: str = "",
+        hash_content: bool = False,
+    ) -> Tuple[str, float, str, Optional[str]]:
+        """
+        Save an uploaded file and also return the full path it was saved to.
+
+        Returns:
+            Tuple of (relative_file_path, file_size_kb, full_file_path,
+            content_hash); the full path is the key itself for S3, and the
+            hash is None unless hash_content is set
+        """
+        relative_path = self._build_relative_path(
+            file.filename, user_id, subdirectory, filename_prefix
+        )
+        is_local = self.is_local
+
+        if not is_local:
+            # The S3 upload consumes the stream, so measure it beforehand
+            _, size_kb = self.get_file_size_info(file)
+
+        reader = None
+        if hash_content:
+            reader = HashingReader(file.stream)
+            file = FileStorage(stream=reader, filename=file.filename)
 
         # Save the file using the backend
         success = self.backend.save_file(file, relative_path)
         if not success:
             raise RuntimeError(f"Failed to save file {relative_path}")
 
-        return relative_path, size_kb
+        content_hash = reader.sha256.hexdigest() if reader is not None else None
+
+        if not is_local:
+            return relative_path, size_kb, relative_path, content_hash
+
+        # One stat of the saved file instead of another pass over the upload
+        full_path = self.backend._get_trusted_full_path(relative_path)
+        size_kb = round(os.path.getsize(full_path) / 1024, 2)
+        return relative_path, size_kb, full_path, content_hash
+
+    def save_streamed_upload(
+        self,
+        stream,
+        headers,
+        user_id: int,
+        field_name: str = "file",
+        is_allowed=None,
+    ) -> Tuple[Optional[str], Optional[str], float, Optional[str]]:
+        """
+        Stream a multipart/form-data upload straight into the user's directory.
+
+        The body is parsed incrementally and the file part is written to disk
+        chunk by chunk, skipping Werkzeug's form parser and its spooled copy.
+
+        Args:
+            stream: Raw request body stream
+            headers: Request headers, including the multipart Content-Type
+            user_id: ID of the user uploading the file
+            field_name: Name of the form field holding the file
+            is_allowed: Optional callable validating the uploaded filename
+
+        Returns:
+            Tuple of (original_filename, relative_file_path, file_size_kb,
+            content_hash). original_filename is None if the field was missing;
+            the path and hash are None if no file was selected or the filename
+            was rejected.
+        """
+        if not HAS_STREAMING_FORM_DATA:
+            raise ImportError("streaming-form-data is required for streaming uploads")
+
+        # Stage next to the final location so local storage can rename in place
+        incoming_dir = None
+        if self.backend.is_local:
+            incoming_dir = self.backend._get_trusted_full_path(".incoming")
+            self.backend._ensure_directory_exists(incoming_dir)
+
+        fd, temp_path = tempfile.mkstemp(dir=incoming_dir)
+        os.close(fd)
+
+        try:
+            parser = StreamingFormDataParser(headers=headers)
+            # Hash the file as it is written so duplicates can be detected
+            target = HashingFileTarget(temp_path)
+            parser.register(field_name, target)
+
+            chunk_size = self.config["UPLOAD_READ_CHUNK_SIZE"]
+            while True:
+                chunk = stream.read(chunk_size)
+                if not chunk:
+                    break
+                parser.data_received(chunk)
+
+            filename = target.multipart_filename
+            if not filename or (is_allowed is not None and not is_allowed(filename)):
+                return filename, None, 0.0, None
+
+            relative_path = self._build_relative_path(filename, user_id)
+            size_kb = round(os.path.getsize(temp_path) / 1024, 2)
+
+            if self.backend.is_local:
+                full_path = self.backend._get_trusted_full_path(relative_path)
+                self.backend._ensure_directory_exists(os.path.dirname(full_path))
+                os.replace(temp_path, full_path)
+            elif not self.backend.save_file(temp_path, relative_path):
+                raise RuntimeError(f"Failed to save file {relative_path}")
+
+            return filename, relative_path, size_kb, target.sha256.hexdigest()
+        finally:
+            try:
+                os.remove(temp_path)
+            except FileNotFoundError:
+                pass
+
+    def _build_relative_path(
+        self,
+        filename: str,
+        user_id: int,
+        subdirectory: Optional[str] = None,
+        filename_prefix: str = "",
+    ) -> str:
+        """Build a unique relative path/key for a file in the user's directory."""
+        unique_filename = self.generate_unique_filename(filename, filename_prefix)
+
+        if subdirectory:
+            return f"{user_id}/{subdirectory}/{unique_filename}"
+        return f"{user_id}/{unique_filename}"
 
     def save_query_file(self, file: FileStorage, user_id: int) -> Tuple[str, str]:
         """
@@ -580,10 +1245,9 @@ class FileStorageService:
         Returns:
             Tuple of (relative_file_path, full_file_path)
         """
-        relative_path, _ = self.save_uploaded_file(
+        relative_path, _, full_path, _ = self._save_uploaded_file(
             file, user_id, subdirectory="queries", filename_prefix="query"
         )
-        full_path = self.get_full_path(relative_path)
         return relative_path, full_path
 
     def delete_file(self, relative_path: str) -> bool:
@@ -622,7 +1286,7 @@ class FileStorageService:
             Path to the created user directory
         """
         user_dir_path = str(user_id)
-        if isinstance(self.backend, LocalStorageBackend):
+        if self.backend.is_local:
             full_path = self.backend._get_full_path(user_dir_path)
             self.backend._ensure_directory_exists(full_path)
             return full_path
@@ -641,36 +1305,59 @@ class FileStorageService:
             True if directory was deleted successfully, False otherwise
         """
         try:
+            if self.backend.is_local:
+                user_dir_path = self.backend._get_full_path(str(user_id))
+                self._remove_local_tree(user_dir_path)
+                self.backend._forget_directories(user_dir_path)
+                return True
+
             user_prefix = f"{user_id}/"
 
-            # List all files with the user prefix
-            files = self.backend.list_files(user_prefix)
+            # Stream the user's keys into batched deletes of up to 1000 keys
+            # per request; failed keys are logged by the backend
+            _, failed = self.backend.delete_files(self.backend.iter_files(user_prefix))
+            return failed == 0
+        except Exception as e:
+            logger.error("Error deleting user directory %s: %s", user_id, e)
+            return False
 
-            # Delete all files
-            success = True
-            for file_key in files:
-                if not self.backend.delete_file(file_key):
-                    success = False
-                    current_app.logger.error(f"Failed to delete file: {file_key}")
+    def _remove_local_tree(self, directory: str) -> None:
+        """
+        Remove a local directory tree, unlinking large trees from a thread pool.
 
-            # For local storage, also try to remove the directory
-            if isinstance(self.backend, LocalStorageBackend):
-                try:
-                    user_dir_path = self.backend._get_full_path(str(user_id))
-                    if os.path.exists(user_dir_path):
-                        shutil.rmtree(user_dir_path)
-                except Exception as e:
-                    current_app.logger.error(
-                        f"Error removing user directory {user_id}: {str(e)}"
-                    )
-                    success = False
+        The tree is walked bottom-up once to collect its files and
+        directories. Unlinks release the GIL, so for big trees they are spread
+        over CLEANUP_WORKERS threads; the directories are then removed
+        deepest first. A missing directory is not an error.
 
-            return success
-        except Exception as e:
-            current_app.logger.error(
-                f"Error deleting user directory {user_id}: {str(e)}"
+        Args:
+            directory: Absolute path of the directory to remove
+        """
+        file_paths = []
+        directories = []
+        for root, dirnames, filenames in os.walk(directory, topdown=False):
+            file_paths.extend(os.path.join(root, name) for name in filenames)
+            # os.walk lists symlinks to directories as directories, but they
+            # are removed with unlink like files
+            file_paths.extend(
+                os.path.join(root, name)
+                for name in dirnames
+                if os.path.islink(os.path.join(root, name))
             )
-            return False
+            directories.append(root)
+
+        if len(file_paths) < self._PARALLEL_RMTREE_MIN_FILES:
+            for path in file_paths:
+                os.unlink(path)
+        else:
+            max_workers = self.config["CLEANUP_WORKERS"]
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                # Consume the results so a failed unlink is raised here
+                for _ in executor.map(os.unlink, file_paths):
+                    pass
+
+        for path in directories:
+            os.rmdir(path)
 
     def cleanup_temp_query_files(self, age_in_hours: int = 24) -> int:
         """
@@ -683,30 +1370,114 @@ class FileStorageService:
             Number of files deleted
         """
         try:
-            files_deleted = 0
-            threshold_time = datetime.now() - timedelta(hours=age_in_hours)
+            # Compared as a plain POSIX timestamp against every file's mtime
+            threshold_ts = time.time() - age_in_hours * 3600
 
-            # Get all query files
-            query_files = self.backend.list_files("queries/")
+            if self.backend.is_local:
+                return self._cleanup_local_query_files(threshold_ts)
 
-            for file_key in query_files:
-                file_info = self.backend.get_file_info(file_key)
-                if file_info and file_info.get("last_modified"):
-                    file_time = file_info["last_modified"]
-                    # Handle timezone-aware datetime from S3
-                    if file_time.tzinfo is not None:
-                        file_time = file_time.replace(tzinfo=None)
+            return self._cleanup_s3_query_files(threshold_ts)
 
-                    if file_time < threshold_time:
-                        if self.backend.delete_file(file_key):
-                            files_deleted += 1
+        except Exception as e:
+            logger.error("Error cleaning up temp query files: %s", e)
+            return 0
 
-            return files_deleted
+    def _cleanup_local_query_files(self, threshold_ts: float) -> int:
+        """
+        Delete local query files modified before the given timestamp.
 
-        except Exception as e:
-            current_app.logger.error(f"Error cleaning up temp query files: {str(e)}")
+        User directories are independent, so their queries directories are
+        cleaned by a thread pool; stat and unlink release the GIL, which lets
+        the walks overlap their I/O latency.
+
+        Args:
+            threshold_ts: POSIX timestamp; older files are deleted
+
+        Returns:
+            Number of files deleted
+        """
+        with os.scandir(self.backend.base_path) as user_dirs:
+            queries_dirs = [
+                os.path.join(user_dir.path, "queries")
+                for user_dir in user_dirs
+                if user_dir.is_dir(follow_symlinks=False)
+            ]
+
+        if not queries_dirs:
             return 0
 
+        max_workers = min(self.config["CLEANUP_WORKERS"], len(queries_dirs))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            return sum(
+                executor.map(
+                    self._cleanup_query_dir, queries_dirs, repeat(threshold_ts)
+                )
+            )
+
+    @staticmethod
+    def _cleanup_query_dir(queries_dir: str, threshold_ts: float) -> int:
+        """
+        Delete stale files under one user's queries directory.
+
+        The directory is walked bottom-up in one pass: every file costs a
+        single stat, and subdirectories left empty are pruned on the way back
+        up. The queries directory itself is kept, since uploads may be about
+        to write into it.
+
+        Args:
+            queries_dir: Absolute path of the queries directory
+            threshold_ts: POSIX timestamp; older files are deleted
+
+        Returns:
+            Number of files deleted
+        """
+        files_deleted = 0
+
+        for root, _, filenames in os.walk(queries_dir, topdown=False):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                try:
+                    if os.lstat(path).st_mtime < threshold_ts:
+                        os.unlink(path)
+                        files_deleted += 1
+                except FileNotFoundError:
+                    pass
+
+            if root != queries_dir:
+                try:
+                    os.rmdir(root)
+                except OSError:
+                    pass  # Still has fresh files in it
+
+        return files_deleted
+
+    def _cleanup_s3_query_files(self, threshold_ts: float) -> int:
+        """
+        Delete S3 query objects last modified before the given time.
+
+        Query files live under "<user_id>/queries/", so the user prefixes are
+        listed first. Modification times come from the listing itself rather
+        than a HEAD request per object, and stale keys are removed in batches.
+
+        Args:
+            threshold_ts: POSIX timestamp; older objects are deleted
+
+        Returns:
+            Number of files deleted
+        """
+        backend = self.backend
+        stale_keys = (
+            key
+            for user_prefix in backend.list_prefixes()
+            for key, last_modified, _ in backend.list_files_with_metadata(
+                f"{user_prefix}queries/"
+            )
+            if last_modified.timestamp() < threshold_ts
+        )
+
+        files_deleted, _ = backend.delete_files(stale_keys)
+        return files_deleted
+
     def get_directory_size(self, relative_path: str) -> int:
         """
         Calculate the total size of a directory in bytes.
@@ -718,22 +1489,53 @@ class FileStorageService:
             Total size in bytes
         """
         try:
-            total_size = 0
-            prefix = relative_path.rstrip("/") + "/"
-
-            files = self.backend.list_files(prefix)
-            for file_key in files:
-                file_info = self.backend.get_file_info(file_key)
-                if file_info:
-                    total_size += file_info.get("size", 0)
+            if self.backend.is_local:
+                return self._local_directory_size(self.get_full_path(relative_path))
 
-            return total_size
+            # Sizes come with the listing, no HEAD request per object
+            prefix = relative_path.rstrip("/") + "/"
+            return sum(
+                size for _, _, size in self.backend.list_files_with_metadata(prefix)
+            )
         except Exception as e:
-            current_app.logger.error(
-                f"Error calculating directory size for {relative_path}: {str(e)}"
+            logger.error(
+                "Error calculating directory size for %s: %s", relative_path, e
             )
             return 0
 
+    def _local_directory_size(self, directory: str) -> int:
+        """
+        Sum the sizes of the files under a local directory.
+
+        Uses an os.scandir walk so each file costs a single stat, instead of
+        listing the tree and then checking and stat-ing every file by key.
+
+        Args:
+            directory: Absolute path of the directory
+
+        Returns:
+            Total size in bytes
+        """
+        total_size = 0
+        pending = [directory]
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except (FileNotFoundError, NotADirectoryError):
+                continue
+
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(entry.path)
+                        continue
+                    try:
+                        total_size += entry.stat().st_size
+                    except FileNotFoundError:
+                        pass
+
+        return total_size
+
     def list_user_files(
         self, user_id: int, subdirectory: Optional[str] = None
     ) -> List[str]:
@@ -755,11 +1557,32 @@ class FileStorageService:
 
             return self.backend.list_files(prefix)
         except Exception as e:
-            current_app.logger.error(
-                f"Error listing files for user {user_id}: {str(e)}"
-            )
+            logger.error("Error listing files for user %s: %s", user_id, e)
             return []
 
+    def iter_user_files(
+        self, user_id: int, subdirectory: Optional[str] = None
+    ) -> Iterator[str]:
+        """
+        Lazily iterate over the files in a user's directory or subdirectory.
+
+        Unlike list_user_files, files are produced as the directory walk or
+        S3 listing reaches them and errors propagate to the caller.
+
+        Args:
+            user_id: ID of the user
+            subdirectory: Optional subdirectory to list
+
+        Returns:
+            Iterator of relative file paths
+        """
+        if subdirectory:
+            prefix = f"{user_id}/{subdirectory}/"
+        else:
+            prefix = f"{user_id}/"
+
+        return self.backend.iter_files(prefix)
+
     def move_file(self, old_relative_path: str, new_relative_path: str) -> bool:
         """
         Move a file from one location to another.
@@ -808,8 +1631,7 @@ class FileStorageService:
         Returns:
             First directory name or None if path is empty
         """
-        parts = path.lstrip("/").split("/")
-        return parts[0] if parts and parts[0] else None
+        return path.lstrip("/").partition("/")[0] or None
 
     def download_file(self, relative_path: str) -> Optional[bytes]:
         """
@@ -822,3 +1644,76 @@ class FileStorageService:
             File content as bytes or None if file doesn't exist
         """
         return self.backend.download_file(relative_path)
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the thread pool that runs blocking calls for the async API."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.config["STORAGE_IO_WORKERS"],
+                        thread_name_prefix="file-storage",
+                    )
+        return self._executor
+
+    async def _run_blocking(self, func, *args, **kwargs):
+        """
+        Run a blocking file operation in the shared thread pool, leaving the
+        event loop free while it waits on the disk or on S3.
+
+        The pool threads have no app context, so the service must be bound to
+        an app with init_app. Under gevent workers, os and socket have to be
+        monkey-patched for these calls to yield.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), partial(func, *args, **kwargs)
+        )
+
+    async def asave_uploaded_file(
+        self,
+        file: FileStorage,
+        user_id: int,
+        subdirectory: Optional[str] = None,
+        filename_prefix: str = "",
+    ) -> Tuple[str, float]:
+        """Async variant of save_uploaded_file."""
+        return await self._run_blocking(
+            self.save_uploaded_file, file, user_id, subdirectory, filename_prefix
+        )
+
+    async def asave_query_file(
+        self, file: FileStorage, user_id: int
+    ) -> Tuple[str, str]:
+        """Async variant of save_query_file."""
+        return await self._run_blocking(self.save_query_file, file, user_id)
+
+    async def adelete_file(self, relative_path: str) -> bool:
+        """Async variant of delete_file."""
+        return await self._run_blocking(self.delete_file, relative_path)
+
+    async def afile_exists(self, relative_path: str) -> bool:
+        """Async variant of file_exists."""
+        return await self._run_blocking(self.file_exists, relative_path)
+
+    async def aget_file_info(self, relative_path: str) -> Optional[dict]:
+        """Async variant of get_file_info."""
+        return await self._run_blocking(self.get_file_info, relative_path)
+
+    async def acopy_file(
+        self, source_relative_path: str, dest_relative_path: str
+    ) -> bool:
+        """Async variant of copy_file."""
+        return await self._run_blocking(
+            self.copy_file, source_relative_path, dest_relative_path
+        )
+
+    async def amove_file(self, old_relative_path: str, new_relative_path: str) -> bool:
+        """Async variant of move_file."""
+        return await self._run_blocking(
+            self.move_file, old_relative_path, new_relative_path
+        )
+
+    async def adownload_file(self, relative_path: str) -> Optional[bytes]:
+        """Async variant of download_file."""
+        return await self._run_blocking(self.download_file, relative_path)
@@ -0,0 +1,175 @@
+"""
+In-process cache of search results keyed by the query embedding.
+
+Repeated and near-identical queries are answered from memory instead of
+running the vector search again. Each user has a cache generation shared by
+all processes through Redis and folded into the cache keys: changing a
+user's content bumps it, so no process serves results cached before the
+change. Changes that don't go through invalidate_user (e.g. embeddings
+finished by a worker) show up once the entries expire after a short TTL.
+"""
+
+import hashlib
+import logging
+import threading
+from typing import Dict, Hashable, Iterable, List, Optional
+
+import numpy as np
+from redis.exceptions import RedisError
+
+from smse_backend.utils.ttl_cache import TTLCache
+
+logger = logging.getLogger(__name__)
+
+
+class QueryResultCache:
+    """LRU cache of search results with hit and miss counters."""
+
+    # Embeddings are rounded to this many decimals before hashing, so
+    # near-identical query vectors share an entry
+    EMBEDDING_DECIMALS = 3
+
+    # Redis key of a user's cache generation; it only has to outlive the
+    # entries cached under it
+    GENERATION_KEY = "smse:search_cache_generation:{}"
+    GENERATION_TTL = 24 * 60 * 60
+
+    def __init__(self, maxsize: int, ttl: float, redis_client=None):
+        self._cache = TTLCache(maxsize, ttl)
+        self.redis = redis_client
+        self._stats_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def make_key(
+        cls,
+        user_id: int,
+        query_embedding: np.ndarray,
+        query_modality: str,
+        search_modalities: Iterable[str],
+        limit: int,
+        generation: int = 0,
+    ) -> Hashable:
+        """
+        Build the cache key of a search.
+
+        The rounded embedding is hashed rather than used directly, so keys
+        stay small and cheap to compare.
+        """
+        rounded = np.round(
+            np.asarray(query_embedding, dtype=np.float32), cls.EMBEDDING_DECIMALS
+        )
+        # Adding 0.0 turns -0.0 into 0.0, which has different bytes
+        rounded += 0.0
+        digest = hashlib.blake2b(rounded.tobytes(), digest_size=16).digest()
+        return (
+            int(user_id),
+            digest,
+            query_modality,
+            tuple(sorted(set(search_modalities))),
+            limit,
+            generation,
+        )
+
+    def key_for(
+        self,
+        user_id: int,
+        query_embedding: np.ndarray,
+        query_modality: str,
+        search_modalities: Iterable[str],
+        limit: int,
+    ) -> Optional[Hashable]:
+        """
+        Build the cache key of a search at the user's current generation.
+
+        Returns:
+            The key, or None if the cache is disabled or the generation can't
+            be read; the search must then bypass the cache, since another
+            process may have changed the user's content
+        """
+        if self._cache.ttl <= 0:
+            return None
+
+        generation = self.generation(user_id)
+        if generation is None:
+            return None
+
+        return self.make_key(
+            user_id,
+            query_embedding,
+            query_modality,
+            search_modalities,
+            limit,
+            generation,
+        )
+
+    def generation(self, user_id: int) -> Optional[int]:
+        """
+        Current cache generation of a user, 0 without Redis.
+
+        Returns:
+            The generation, or None if Redis is unavailable
+        """
+        if self.redis is None:
+            return 0
+
+        try:
+            value = self.redis.get(self.GENERATION_KEY.format(int(user_id)))
+        except RedisError as e:
+            logger.warning("Search cache generation lookup failed: %s", e)
+            return None
+        return int(value) if value else 0
+
+    def get(self, key: Hashable) -> Optional[List[Dict]]:
+        """Return a copy of the cached results for a key, or None on a miss."""
+        results = self._cache.get(key)
+        with self._stats_lock:
+            if results is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+
+        return [dict(result) for result in results]
+
+    def put(self, key: Hashable, results: List[Dict]) -> None:
+        """Cache the results of a search."""
+        self._cache.set(key, [dict(result) for result in results])
+
+    def invalidate_user(self, user_id: int) -> None:
+        """
+        Drop every cached search of a user, e.g. after their content changed.
+
+        Entries of this process are dropped right away; other processes stop
+        using theirs once they see the bumped generation.
+        """
+        user_id = int(user_id)
+        self._cache.discard_if(lambda key: key[0] == user_id)
+
+        if self.redis is None:
+            return
+
+        generation_key = self.GENERATION_KEY.format(user_id)
+        try:
+            pipe = self.redis.pipeline()
+            pipe.incr(generation_key)
+            pipe.expire(generation_key, self.GENERATION_TTL)
+            pipe.execute()
+        except RedisError as e:
+            logger.error("Search cache invalidation failed for user %s: %s", user_id, e)
+
+    def clear(self) -> None:
+        """Drop every cached search."""
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, float]:
+        """Hit and miss counts since startup, for monitoring."""
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+
+        lookups = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
@@ -1,9 +1,9 @@
 import numpy as np
 from flask import current_app
-from sqlalchemy.sql import text
+from sqlalchemy.sql import bindparam, text
 from smse_backend import db
-import math
-from typing import Dict, List
+from smse_backend.models.embedding import EMBEDDING_DIM, Float32Vector
+from typing import Dict, List, Sequence
 
 
 modality_thresholds = {
@@ -24,113 +24,223 @@ modality_thresholds = {
     },
 }
 
+# The same thresholds as a matrix indexed by modality code, query modality
+# first, so a search looks up its whole row once
+MODALITY_INDEX = {modality: index for index, modality in enumerate(modality_thresholds)}
+THRESHOLD_MATRIX = np.array(
+    [
+        [modality_thresholds[query][content] for content in MODALITY_INDEX]
+        for query in MODALITY_INDEX
+    ],
+    dtype=np.float64,
+)
+
+
+# Built once so the compiled statement is reused across searches; the query
+# vector is a typed bind parameter instead of a literal pasted into the SQL.
+# All requested modalities are searched in one round trip: each modality and
+# its distance cutoff is a row of the unnested arrays, and the lateral
+# subquery searches that modality (with its own LIMIT and index scan).
+# Candidates are ranked by the halfvec distance so the HNSW index on
+# vector::halfvec is used, but scored and thresholded at full precision so
+# the modality thresholds are unaffected. Rows below the threshold are
+# dropped in the database, so LIMIT counts only qualifying rows.
+SEARCH_MODALITIES_SQL = text(
+    f"""
+    SELECT
+        m.modality,
+        r.content_id,
+        r.content_path,
+        r.content_tag,
+        r.similarity_score
+    FROM unnest(
+        CAST(:modalities AS varchar[]), CAST(:max_distances AS float8[])
+    ) AS m(modality, max_distance)
+    CROSS JOIN LATERAL (
+        SELECT
+            c.id as content_id,
+            c.content_path,
+            c.content_tag,
+            1-(e.vector <=> :query_embedding) AS similarity_score
+        FROM contents c
+        JOIN embeddings e ON c.embedding_id = e.id
+        WHERE c.user_id = :user_id
+          AND e.vector IS NOT NULL
+          AND e.modality = m.modality
+          AND e.vector <=> :query_embedding <= m.max_distance
+        ORDER BY e.vector::halfvec({EMBEDDING_DIM})
+            <=> CAST(:query_embedding AS halfvec({EMBEDDING_DIM}))
+        LIMIT :limit
+    ) r
+    """
+).bindparams(bindparam("query_embedding", type_=Float32Vector(EMBEDDING_DIM)))
+
+# Per-transaction index settings, applied in one round trip. SET can't take
+# bind parameters, set_config can. pgvector's ef_search defaults to 40 and
+# accepts at most 1000.
+CONFIGURE_HNSW_SCAN_SQL = text(
+    """
+    SELECT
+        set_config('hnsw.iterative_scan', 'relaxed_order', true),
+        set_config('hnsw.ef_search', :ef_search, true)
+    """
+)
+HNSW_MIN_EF_SEARCH = 40
+HNSW_MAX_EF_SEARCH = 1000
+
+# Reciprocal rank fusion constant: a result ranked r within its modality
+# scores 1 / (RRF_K + r); 60 is the customary value
+RRF_K = 60
+
+
+def configure_hnsw_scan(limit: int) -> None:
+    """
+    Tune the HNSW index scan of the current transaction for a search.
+
+    The half-precision index is walked past rows filtered out by user and
+    modality instead of stopping at the first ef_search candidates, and the
+    candidate list is sized to the number of results requested.
 
-def softmax(scores: List[float]) -> List[float]:
+    Args:
+        limit (int): Number of results the search asks for
     """
-    Apply softmax normalization to a list of similarity scores.
+    ef_search = limit * current_app.config["PGVECTOR_EF_MULTIPLIER"]
+    ef_search = min(max(ef_search, HNSW_MIN_EF_SEARCH), HNSW_MAX_EF_SEARCH)
+    db.session.execute(CONFIGURE_HNSW_SCAN_SQL, {"ef_search": str(ef_search)})
+
+
+def softmax(scores: Sequence[float]) -> np.ndarray:
+    """
+    Apply softmax normalization to similarity scores.
 
     Args:
-        scores (List[float]): List of similarity scores
+        scores (Sequence[float]): Similarity scores, as a list or array
 
     Returns:
-        List[float]: Normalized scores that sum to 1
+        np.ndarray: Normalized float32 scores that sum to 1
     """
-    if not scores:
-        return []
+    normalized = np.array(scores, dtype=np.float32)
+    if not normalized.size:
+        return normalized
 
-    # Shift scores for numerical stability
-    max_score = max(scores)
-    exp_scores = [math.exp(score - max_score) for score in scores]
-    sum_exp_scores = sum(exp_scores)
+    # Shift scores for numerical stability; the largest term becomes exp(0) = 1,
+    # so the sum can't be zero
+    normalized -= normalized.max()
+    np.exp(normalized, out=normalized)
+    normalized /= normalized.sum()
+    return normalized
 
-    # Handle case where all scores are equal (or empty)
-    if sum_exp_scores == 0:
-        n = len(scores)
-        return [1.0 / n] * n if n > 0 else []
 
-    return [exp_score / sum_exp_scores for exp_score in exp_scores]
+def reciprocal_rank_fusion(
+    groups: Sequence[str], scores: Sequence[float], k: int = RRF_K
+) -> np.ndarray:
+    """
+    Score results by their rank among the results of the same group.
 
+    Args:
+        groups (Sequence[str]): Group of each result, e.g. its modality
+        scores (Sequence[float]): Score of each result, higher is better
+        k (int): Fusion constant, a result ranked r scores 1 / (k + r)
 
-def min_max_normalize(scores: List[float]) -> List[float]:
+    Returns:
+        np.ndarray: Fused float64 scores, in the order of the input
+    """
+    scores = np.asarray(scores, dtype=np.float64)
+    _, group_codes = np.unique(np.asarray(groups), return_inverse=True)
+
+    # Sort by group, then by descending score, so each group is a contiguous
+    # run whose position within the run is the rank
+    order = np.lexsort((-scores, group_codes))
+    sorted_codes = group_codes[order]
+    run_starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    run_lengths = np.diff(np.r_[run_starts, len(order)])
+
+    ranks = np.empty(len(order), dtype=np.int64)
+    ranks[order] = np.arange(1, len(order) + 1) - np.repeat(run_starts, run_lengths)
+    return 1.0 / (k + ranks)
+
+
+def min_max_normalize(scores: Sequence[float]) -> np.ndarray:
     """
     Apply min-max normalization to scale scores between 0 and 1.
 
     Args:
-        scores (List[float]): List of similarity scores
+        scores (Sequence[float]): Similarity scores, as a list or array
 
     Returns:
-        List[float]: Normalized scores between 0 and 1
+        np.ndarray: Normalized float32 scores between 0 and 1
     """
-    if not scores:
-        return []
+    normalized = np.array(scores, dtype=np.float32)
+    if not normalized.size:
+        return normalized
 
-    min_score = min(scores)
-    max_score = max(scores)
+    min_score = normalized.min()
+    score_range = normalized.max() - min_score
 
     # Handle case where all scores are equal
-    if max_score == min_score:
-        return [1.0] * len(scores)
+    if score_range == 0:
+        normalized.fill(1.0)
+        return normalized
 
-    return [(score - min_score) / (max_score - min_score) for score in scores]
+    normalized -= min_score
+    normalized /= score_range
+    return normalized
 
 
-def search_by_modality(
-    query_embedding: np.ndarray, user_id: int, modality: str, limit: int = 30
+def search_all_modalities(
+    query_embedding: np.ndarray,
+    user_id: int,
+    min_similarities: Dict[str, float],
+    limit: int = 30,
 ) -> List[Dict]:
     """
-    Search for content files of a specific modality based on query embedding.
+    Search content of several modalities with a single query.
+
+    Database errors are raised rather than turned into empty results, so the
+    caller can tell a failed search from one without matches.
 
     Args:
         query_embedding (np.ndarray): The query embedding vector
-        modality (str): The modality to search for ("text", "image", "audio")
-        limit (int): Maximum number of results to return
-        offset (int): Number of results to skip
+        user_id (int): ID of the user whose content is searched
+        min_similarities (Dict[str, float]): Minimum cosine similarity of the
+            returned results, keyed by the modality to search
+        limit (int): Maximum number of results to return per modality
 
     Returns:
-        List[Dict]: List of dictionaries with content_id and similarity_score
+        List[Dict]: List of dictionaries with content_id, content_path,
+        content_tag, similarity_score and modality
     """
-    try:
-        # Convert the embedding to a string format compatible with pgvector
-        embedding_str = ",".join(map(str, query_embedding))
-
-        # Use raw SQL with pgvector for similarity search, filtering by modality
-        sql = text(
-            f"""
-            SELECT 
-                c.id as content_id,
-                1-(e.vector <=> '[{embedding_str}]') AS similarity_score
-            FROM contents c
-            JOIN embeddings e ON c.embedding_id = e.id
-            WHERE c.user_id = :user_id
-              AND e.vector IS NOT NULL
-              AND e.modality = :modality
-            ORDER BY 1-(e.vector <=> '[{embedding_str}]') DESC
-            LIMIT :limit
-            """
-        )
-
-        # Execute the query
-        result = db.session.execute(
-            sql, {"user_id": user_id, "modality": modality, "limit": limit}
-        )
-
-        # Process results
-        search_results = []
-        for row in result:
-            search_results.append(
-                {
-                    "content_id": row.content_id,
-                    "similarity_score": float(row.similarity_score),
-                    "modality": modality,
-                }
-            )
-
-        return search_results
-
-    except Exception as e:
-        current_app.logger.error(f"Search error for {modality}: {str(e)}")
+    if not min_similarities:
         return []
 
+    modalities = list(min_similarities)
+    configure_hnsw_scan(limit)
+
+    result = db.session.execute(
+        SEARCH_MODALITIES_SQL,
+        {
+            "query_embedding": query_embedding,
+            "user_id": user_id,
+            "modalities": modalities,
+            # Cosine distance is 1 - similarity
+            "max_distances": [
+                1 - min_similarities[modality] for modality in modalities
+            ],
+            "limit": limit,
+        },
+    )
+
+    return [
+        {
+            "content_id": row.content_id,
+            "content_path": row.content_path,
+            "content_tag": row.content_tag,
+            "similarity_score": float(row.similarity_score),
+            "modality": row.modality,
+        }
+        for row in result
+    ]
+
 
 def search(
     query_embedding: np.ndarray,
@@ -147,74 +257,74 @@ def search(
         limit (int): Maximum number of results to return
 
     Returns:
-        List[Dict]: List of dictionaries containing content_id, similarity_score, and modality
+        List[Dict]: List of dictionaries containing content_id, content_path,
+        content_tag, similarity_score, fused_score and modality, best first
     """
     try:
-        # Search each modality
-        all_results = []
-
+        # Convert once here; an empty or non-finite vector can't match anything
+        # and would only fail in the database
+        if query_embedding is None:
+            return []
+        query_embedding = np.ascontiguousarray(query_embedding, dtype=np.float32)
+        if not query_embedding.size or not np.isfinite(query_embedding).all():
+            current_app.logger.warning("Invalid query embedding. Skipping search.")
+            return []
+
+        thresholds = THRESHOLD_MATRIX[MODALITY_INDEX[query_modality]]
+        min_similarities = {}
         for modality in search_modalities:
 
-            if modality not in ["text", "image", "audio"]:
+            if modality not in MODALITY_INDEX:
                 current_app.logger.warning(
                     f"Unsupported modality: {modality}. Skipping search."
                 )
                 continue
 
-            modality_results = search_by_modality(
+            min_similarities[modality] = float(thresholds[MODALITY_INDEX[modality]])
+
+        query_cache = current_app.query_cache
+        cache_key = query_cache.key_for(
+            user_id, query_embedding, query_modality, min_similarities, limit
+        )
+        if cache_key is not None:
+            cached_results = query_cache.get(cache_key)
+            if cached_results is not None:
+                return cached_results
+
+        # All modalities are searched in one round trip. The search runs in a
+        # savepoint, so a failed search doesn't abort the caller's transaction
+        with db.session.begin_nested():
+            all_results = search_all_modalities(
                 query_embedding=query_embedding,
                 user_id=user_id,
-                modality=modality,
+                min_similarities=min_similarities,
                 limit=limit,
             )
 
-            filtered_results = []
-
-            for index, result in enumerate(modality_results):
-                print(
-                    result["similarity_score"],
-                    modality_thresholds[query_modality][modality],
-                    index,
-                    result["content_id"],
-                )
-                if (
-                    not result["similarity_score"]
-                    < modality_thresholds[query_modality][modality]
-                ):
-                    filtered_results.append(result)
-
-            # Skip empty results
-            if not modality_results:
-                continue
-
-            scores = [result["similarity_score"] for result in filtered_results]
-
-            # Normalize scores using softmax - keeps scores relative within the same modality
-            normalized_scores = scores  # min_max_normalize(scores)
-
-            # Update results with normalized scores
-            for i, result in enumerate(filtered_results):
-                result["normalized_score"] = normalized_scores[i]
-
-            all_results.extend(filtered_results)
-
-        # Sort by normalized score (descending)
-        all_results.sort(key=lambda x: x["normalized_score"], reverse=True)
-
-        # Apply pagination
-        paginated_results = all_results[0:limit]
-
-        # Filter by threshold and prepare final results
-        final_results = [
-            {
-                "content_id": result["content_id"],
-                "similarity_score": result["normalized_score"],
-                "modality": result["modality"],
-            }
-            for result in paginated_results
-        ]
-
-        return final_results
+        # Similarities of different modality pairs aren't on the same scale, so
+        # results are merged by their rank within their modality (reciprocal
+        # rank fusion); ties between modalities go to the higher similarity.
+        # Scores are ranked as arrays and only the kept results are touched
+        similarities = np.fromiter(
+            (result["similarity_score"] for result in all_results),
+            dtype=np.float64,
+            count=len(all_results),
+        )
+        fused_scores = reciprocal_rank_fusion(
+            [result["modality"] for result in all_results], similarities
+        )
+        top = np.lexsort((-similarities, -fused_scores))[:limit]
+
+        results = []
+        for index in top:
+            result = all_results[index]
+            result["fused_score"] = float(fused_scores[index])
+            results.append(result)
+
+        # Only successful searches get here, failures aren't cached
+        if cache_key is not None:
+            query_cache.put(cache_key, results)
+        return results
 
     except Exception as e:
         current_app.logger.error(f"Multi-modal search error: {str(e)}")
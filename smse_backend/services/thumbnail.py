@@ -8,10 +8,19 @@ thumbnails for faster loading and reduced bandwidth usage.
 
 import os
 import io
-from typing import Optional, Tuple
-from PIL import Image, ImageOps
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import BinaryIO, Optional, Tuple
+from PIL import Image, ImageOps, features
 from werkzeug.datastructures import FileStorage
 from flask import current_app
+from smse_backend import db
+from smse_backend.models import Content
+
+# Whether Pillow decodes and encodes JPEGs with the SIMD-accelerated
+# libjpeg-turbo (bundled with the official wheels)
+HAS_LIBJPEG_TURBO = bool(features.check_feature("libjpeg_turbo"))
 
 
 class ThumbnailService:
@@ -21,18 +30,44 @@ class ThumbnailService:
     DEFAULT_THUMBNAIL_SIZE = (320, 180)
     THUMBNAIL_QUALITY = 85
     THUMBNAIL_FORMAT = "JPEG"
+    # Encode in a single pass with 4:2:0 chroma subsampling; optimized
+    # Huffman tables save only a few hundred bytes at thumbnail sizes but
+    # take a second pass over the image
+    ENCODE_FAST = True
+    # Cache-Control stored with thumbnails on S3
+    THUMBNAIL_CACHE_CONTROL = "public, max-age=31536000, immutable"
 
     # Supported image formats for thumbnail generation
     SUPPORTED_FORMATS = {".jpg", ".jpeg", ".png", ".gif", ".webp", ".bmp", ".tiff"}
 
-    def __init__(self, file_storage_service):
+    # Pillow decoders for the supported formats; only these are tried when
+    # opening an image instead of probing every registered plugin
+    PIL_FORMATS = ("JPEG", "PNG", "GIF", "WEBP", "BMP", "TIFF")
+
+    def __init__(self, file_storage_service, max_workers: int = 0):
         """
         Initialize the thumbnail service.
 
         Args:
             file_storage_service: The file storage service instance
+            max_workers (int): Threads that generate scheduled thumbnails;
+                0 generates them when they are scheduled
         """
         self.file_storage = file_storage_service
+        self.max_workers = max_workers
+        self._executor = None
+        self._executor_lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        """Get the thread pool that generates scheduled thumbnails."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="thumbnail",
+                    )
+        return self._executor
 
     def is_supported_file(self, file_path: str) -> bool:
         """
@@ -44,8 +79,13 @@ class ThumbnailService:
         Returns:
             bool: True if the file is a supported image format
         """
-        _, ext = os.path.splitext(file_path)
-        return ext.lower() in self.SUPPORTED_FORMATS
+        return self._is_supported_extension(os.path.splitext(file_path)[1])
+
+    @classmethod
+    @lru_cache(maxsize=256)
+    def _is_supported_extension(cls, ext: str) -> bool:
+        """Check an extension, in any case, against the supported formats."""
+        return ext.lower() in cls.SUPPORTED_FORMATS
 
     def generate_thumbnail_path(self, original_path: str) -> str:
         """
@@ -84,12 +124,9 @@ class ThumbnailService:
             thumbnail_size = self.DEFAULT_THUMBNAIL_SIZE
 
         try:
-            # Read the file content
+            # Decode straight from the upload stream instead of copying it
             file.seek(0)  # Reset file pointer
-            image_bytes = file.read()
-            file.seek(0)  # Reset again for other operations
-
-            return self.generate_thumbnail_from_bytes(image_bytes, thumbnail_size)
+            return self._generate_thumbnail(file.stream, thumbnail_size)
 
         except Exception as e:
             current_app.logger.error(
@@ -97,6 +134,9 @@ class ThumbnailService:
             )
             return None
 
+        finally:
+            file.seek(0)  # Reset again for other operations
+
     def generate_thumbnail_from_bytes(
         self, image_bytes: bytes, thumbnail_size: Tuple[int, int] = None
     ) -> Optional[bytes]:
@@ -114,41 +154,72 @@ class ThumbnailService:
             thumbnail_size = self.DEFAULT_THUMBNAIL_SIZE
 
         try:
-            # Open image from bytes
-            image = Image.open(io.BytesIO(image_bytes))
-
-            # Convert to RGB if necessary (for formats like PNG with transparency)
-            if image.mode in ("RGBA", "LA", "P"):
-                # Create a white background
-                background = Image.new("RGB", image.size, (255, 255, 255))
-                if image.mode == "P":
-                    image = image.convert("RGBA")
-                background.paste(
-                    image, mask=image.split()[-1] if image.mode == "RGBA" else None
-                )
-                image = background
-            elif image.mode != "RGB":
-                image = image.convert("RGB")
-
-            # Generate thumbnail using ImageOps.fit for better quality
-            # This maintains aspect ratio and crops to exact size
-            thumbnail = ImageOps.fit(image, thumbnail_size, Image.Resampling.LANCZOS)
-
-            # Save thumbnail to bytes
-            thumbnail_io = io.BytesIO()
-            thumbnail.save(
-                thumbnail_io,
-                format=self.THUMBNAIL_FORMAT,
-                quality=self.THUMBNAIL_QUALITY,
-                optimize=True,
-            )
-
-            return thumbnail_io.getvalue()
+            return self._generate_thumbnail(io.BytesIO(image_bytes), thumbnail_size)
 
         except Exception as e:
             current_app.logger.error(f"Failed to generate thumbnail from bytes: {e}")
             return None
 
+    def _generate_thumbnail(
+        self, image_file: BinaryIO, thumbnail_size: Tuple[int, int]
+    ) -> bytes:
+        """
+        Generate a thumbnail from a binary file object.
+
+        Args:
+            image_file (BinaryIO): Seekable file object positioned at the image
+            thumbnail_size (Tuple[int, int]): Thumbnail dimensions
+
+        Returns:
+            bytes: Thumbnail image bytes
+        """
+        image = Image.open(image_file, formats=self.PIL_FORMATS)
+
+        # Let JPEGs decode at a reduced scale (1/2 to 1/8) that still
+        # covers twice the thumbnail size, so far fewer pixels are
+        # resampled; other formats ignore this
+        image.draft("RGB", (thumbnail_size[0] * 2, thumbnail_size[1] * 2))
+
+        # Convert to RGB if necessary (for formats like PNG with transparency)
+        if image.mode in ("RGBA", "LA", "P") and self._has_transparency(image):
+            # Create a white background
+            background = Image.new("RGB", image.size, (255, 255, 255))
+            if image.mode == "P":
+                image = image.convert("RGBA")
+            background.paste(
+                image, mask=image.split()[-1] if image.mode == "RGBA" else None
+            )
+            image = background
+        elif image.mode != "RGB":
+            image = image.convert("RGB")
+
+        # Generate thumbnail using ImageOps.fit for better quality
+        # This maintains aspect ratio and crops to exact size
+        thumbnail = ImageOps.fit(image, thumbnail_size, Image.Resampling.LANCZOS)
+
+        # Save thumbnail to bytes
+        thumbnail_io = io.BytesIO()
+        thumbnail.save(
+            thumbnail_io,
+            format=self.THUMBNAIL_FORMAT,
+            quality=self.THUMBNAIL_QUALITY,
+            optimize=not self.ENCODE_FAST,
+            progressive=False,
+            subsampling=2,
+        )
+
+        return thumbnail_io.getvalue()
+
+    @staticmethod
+    def _has_transparency(image: Image.Image) -> bool:
+        """
+        Check whether an image with an alpha channel or palette actually has
+        transparent pixels; opaque images can be converted to RGB directly.
+        """
+        if image.mode == "P":
+            return "transparency" in image.info
+        return image.getchannel("A").getextrema()[0] < 255
+
     def generate_thumbnail_from_path(
         self, file_path: str, thumbnail_size: Tuple[int, int] = None
     ) -> Optional[bytes]:
@@ -203,19 +274,14 @@ class ThumbnailService:
                     f.write(thumbnail_bytes)
                 return True
             else:
-                # S3 storage backend
-                thumbnail_file = io.BytesIO(thumbnail_bytes)
-                # For S3, we can use the upload_fileobj method directly
-                try:
-                    self.file_storage.backend.s3_client.upload_fileobj(
-                        thumbnail_file,
-                        self.file_storage.backend.bucket_name,
-                        thumbnail_path,
-                    )
-                    return True
-                except Exception as e:
-                    current_app.logger.error(f"Failed to upload thumbnail to S3: {e}")
-                    return False
+                # S3 storage backend; saving through it keeps its cache coherent.
+                # Thumbnail paths never get new content, so they can be cached
+                return self.file_storage.backend.save_bytes(
+                    thumbnail_bytes,
+                    thumbnail_path,
+                    content_type="image/jpeg",
+                    cache_control=self.THUMBNAIL_CACHE_CONTROL,
+                )
 
         except Exception as e:
             current_app.logger.error(
@@ -303,6 +369,90 @@ class ThumbnailService:
 
         return None
 
+    def schedule_thumbnail(
+        self,
+        original_path: str,
+        thumbnail_size: Tuple[int, int] = None,
+        content_id: Optional[int] = None,
+    ) -> Optional[str]:
+        """
+        Generate and save a thumbnail for a stored file in the background.
+
+        The thumbnail path is returned right away; the file shows up there
+        once generated. If generation fails, the thumbnail path of the given
+        content is cleared so clients stop asking for it. Without background
+        workers the thumbnail is generated before returning.
+
+        Args:
+            original_path (str): Path where the original file is stored
+            thumbnail_size (Tuple[int, int], optional): Thumbnail dimensions
+            content_id (int, optional): ID of the content the thumbnail is for
+
+        Returns:
+            Optional[str]: Thumbnail path, None if the file isn't supported
+            (or, without background workers, if generation failed)
+        """
+        if not self.is_supported_file(original_path):
+            return None
+
+        if not self.max_workers:
+            return self._generate_scheduled(original_path, thumbnail_size, content_id)
+
+        self._get_executor().submit(
+            self._generate_in_background,
+            current_app._get_current_object(),
+            original_path,
+            thumbnail_size,
+            content_id,
+        )
+        return self.generate_thumbnail_path(original_path)
+
+    def _generate_in_background(
+        self,
+        app,
+        original_path: str,
+        thumbnail_size: Tuple[int, int],
+        content_id: Optional[int],
+    ) -> None:
+        """Generate a scheduled thumbnail; pool threads need the app context."""
+        with app.app_context():
+            self._generate_scheduled(original_path, thumbnail_size, content_id)
+
+    def _generate_scheduled(
+        self,
+        original_path: str,
+        thumbnail_size: Tuple[int, int],
+        content_id: Optional[int],
+    ) -> Optional[str]:
+        """Generate a scheduled thumbnail, unlinking it from its content on failure."""
+        try:
+            thumbnail_path = self.generate_and_save_thumbnail_from_path(
+                original_path, thumbnail_size
+            )
+        except Exception as e:
+            thumbnail_path = None
+            current_app.logger.error(f"Thumbnail generation crashed: {e}")
+
+        if thumbnail_path is None:
+            current_app.logger.error(
+                f"Failed to generate thumbnail for {original_path}"
+            )
+            if content_id is not None:
+                self._clear_thumbnail_path(content_id)
+
+        return thumbnail_path
+
+    def _clear_thumbnail_path(self, content_id: int) -> None:
+        """Record that a content has no thumbnail."""
+        try:
+            Content.query.filter_by(id=content_id).update({"thumbnail_path": None})
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.error(
+                f"Failed to clear thumbnail path of content {content_id}: {e}"
+            )
+
     def delete_thumbnail(self, thumbnail_path: str) -> bool:
         """
         Delete a thumbnail file.
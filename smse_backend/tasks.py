@@ -2,10 +2,13 @@
 This module contains Celery tasks for processing files with SMSE.
 """
 
+import json
 import tempfile
+import threading
 import os
 from pathlib import Path
 from celery import shared_task
+from celery.signals import worker_process_init
 
 # Optional SMSE imports - only available in worker environment
 try:
@@ -27,12 +30,16 @@ except ImportError:
         AUDIO = "audio"
 
 
-from smse_backend.models import Content, Embedding, Model
+from smse_backend.models import Content, Embedding
 from smse_backend import db
 from flask import current_app
 
 
-# Global variables to store models and pipelines
+# Redis list buffering uploads that wait to be embedded in a batch
+EMBEDDING_BATCH_KEY = "smse:embedding_batch"
+
+# Global variables to store models and pipelines, loaded once per process
+_model_lock = threading.Lock()
 _model = None
 _image_pipeline = None
 _audio_pipeline = None
@@ -48,11 +55,18 @@ def _initialize_model():
             "SMSE is not available in this environment. This task should only run in worker containers."
         )
 
-    if _model is None:
+    if _model is not None:
+        return
+
+    with _model_lock:
+        # Another thread may have finished loading while this one waited
+        if _model is not None:
+            return
+
         device = get_device()
 
         # Initialize ImageBind model
-        _model = ImageBindModel(device=device)
+        model = ImageBindModel(device=device)
 
         # Initialize image pipeline
         _image_pipeline = ImagePipeline(
@@ -102,6 +116,22 @@ def _initialize_model():
             )
         )
 
+        # Publish the model last so no thread sees it half-initialized
+        _model = model
+
+
+@worker_process_init.connect
+def _warm_up_model(**kwargs):
+    """Load the model when a worker process starts, before its first task."""
+    if not SMSE_AVAILABLE:
+        return
+
+    try:
+        _initialize_model()
+    except Exception as e:
+        # The first task retries the load and reports the error
+        print(f"Warning: Failed to load SMSE model at worker start: {e}")
+
 
 def _download_file_for_processing(file_path):
     """
@@ -113,10 +143,8 @@ def _download_file_for_processing(file_path):
     Returns:
         str: Path to the temporary local file
     """
-    from smse_backend.services.file_storage import S3StorageBackend
-
     # Check if we're using S3 storage
-    if isinstance(current_app.file_storage.backend, S3StorageBackend):
+    if not current_app.file_storage.is_local:
         # For S3 storage, download the file to a temporary location
         file_info = current_app.file_storage.get_file_info(file_path)
         if not file_info:
@@ -155,12 +183,11 @@ def _cleanup_temp_file(temp_path, original_path):
         temp_path (str): Path to temporary file
         original_path (str): Original storage path
     """
-    from smse_backend.services.file_storage import S3StorageBackend
-
     # Only clean up if we're using S3 storage and the paths are different
-    if isinstance(
-        current_app.file_storage.backend, S3StorageBackend
-    ) and temp_path != current_app.file_storage.get_full_path(original_path):
+    if (
+        not current_app.file_storage.is_local
+        and temp_path != current_app.file_storage.get_full_path(original_path)
+    ):
         try:
             if os.path.exists(temp_path):
                 os.unlink(temp_path)
@@ -203,20 +230,36 @@ def _process_file(file_path, modality):
     Returns:
         np.ndarray: The embedding vector
     """
-    _initialize_model()
+    return _process_files([file_path], modality)[0]
+
 
-    # Download file to local temporary location if needed
-    local_path = _download_file_for_processing(file_path)
+def _process_files(file_paths, modality):
+    """
+    Process several files of the same modality with a single model call.
 
+    Args:
+        file_paths (list): Storage paths of the files
+        modality (Modality): The modality of the files
+
+    Returns:
+        list: The embedding vectors, in the same order as file_paths
+    """
+    _initialize_model()
+
+    local_paths = []
     try:
-        path = Path(local_path)
+        # Download files to local temporary locations if needed
+        for file_path in file_paths:
+            local_paths.append((_download_file_for_processing(file_path), file_path))
+
+        paths = [Path(local_path) for local_path, _ in local_paths]
 
         if modality == Modality.IMAGE:
-            processed_input = _image_pipeline([path])
+            processed_input = _image_pipeline(paths)
         elif modality == Modality.AUDIO:
-            processed_input = _audio_pipeline([path])
+            processed_input = _audio_pipeline(paths)
         elif modality == Modality.TEXT:
-            processed_input = _text_pipeline([path])
+            processed_input = _text_pipeline(paths)
         else:
             raise ValueError(f"Unsupported modality: {modality}")
 
@@ -226,12 +269,12 @@ def _process_file(file_path, modality):
         # Get embeddings
         embeddings = _model.encode(inputs)
 
-        # Return the first embedding vector
-        return embeddings[modality][0].cpu().numpy()
+        return [embedding.cpu().numpy() for embedding in embeddings[modality]]
 
     finally:
-        # Clean up temporary file if it was created
-        _cleanup_temp_file(local_path, file_path)
+        # Clean up temporary files if they were created
+        for local_path, file_path in local_paths:
+            _cleanup_temp_file(local_path, file_path)
 
 
 def _process_text(text_content):
@@ -283,28 +326,8 @@ def process_file(self, file_path, content_id=None):
 
         # Process the file to get embedding vector
         embedding_vector = _process_file(file_path, modality)
-        # Get user chosen model (using model ID 1 for now)
-        try:
-            model = db.session.get(Model, 1)
-            if model is None:
-                # If model doesn't exist, create a default model
-                model = Model(
-                    name="Default Model", description="Default model created by system"
-                )
-                db.session.add(model)
-                db.session.commit()
-
-            model_id = model.id
-        except Exception as db_error:
-            self.update_state(
-                state="FAILURE",
-                meta={
-                    "exc_type": "DatabaseError",
-                    "exc_message": f"Error accessing model: {str(db_error)}",
-                    "status": "error",
-                },
-            )
-            raise db_error
+        # Get user chosen model (the configured default for now)
+        model_id = current_app.config["DEFAULT_MODEL_ID"]
 
         # Create new embedding record
         new_embedding = Embedding(
@@ -355,6 +378,181 @@ def process_file(self, file_path, content_id=None):
         raise e
 
 
+def _pop_embedding_jobs(count):
+    """
+    Atomically take up to count pending jobs off the embedding batch buffer.
+
+    Args:
+        count (int): Maximum number of jobs to take
+
+    Returns:
+        list: The pending jobs, oldest first
+    """
+    pipe = current_app.redis.pipeline()
+    pipe.lrange(EMBEDDING_BATCH_KEY, 0, count - 1)
+    pipe.ltrim(EMBEDDING_BATCH_KEY, count, -1)
+    raw_jobs, _ = pipe.execute()
+    return [json.loads(raw_job) for raw_job in raw_jobs]
+
+
+def _embed_files(file_paths, modality):
+    """
+    Embed files of the same modality, as one model call where possible.
+
+    If embedding the files together fails, they are embedded one at a time so
+    that a single unreadable or corrupt file only fails its own job.
+
+    Args:
+        file_paths (list): Storage paths of the files
+        modality (Modality): The modality of the files
+
+    Returns:
+        list: The embedding vector, or the exception raised while embedding
+        it, of each file, in the same order as file_paths
+    """
+    # Text files are split into chunks, so they are always embedded one at a time
+    if modality != Modality.TEXT and len(file_paths) > 1:
+        try:
+            return _process_files(file_paths, modality)
+        except Exception as e:
+            current_app.logger.warning(
+                f"Batch embedding of {len(file_paths)} files failed, "
+                f"retrying them one at a time: {e}"
+            )
+
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append(_process_file(file_path, modality))
+        except Exception as e:
+            results.append(e)
+    return results
+
+
+def _schedule_next_batch(task, batch_size):
+    """
+    Keep draining the embedding batch buffer if jobs are still waiting.
+
+    Args:
+        task: The running batch task, rescheduled on the embedding queue
+        batch_size (int): Number of jobs that make a full batch
+    """
+    remaining = current_app.redis.llen(EMBEDDING_BATCH_KEY)
+    if remaining:
+        task.apply_async(
+            queue=current_app.config["EMBEDDING_QUEUE"],
+            countdown=(
+                0
+                if remaining >= batch_size
+                else current_app.config["EMBEDDING_BATCH_TIMEOUT"]
+            ),
+        )
+
+
+@shared_task(bind=True, name="process_file_batch")
+def process_file_batch(self):
+    """
+    Celery task to embed a batch of buffered uploads with as few model calls as
+    possible, then record every embedding in a single commit.
+
+    Each buffered job carries the task ID handed out when it was scheduled, and
+    its result is stored under that ID so it can be polled like any other task.
+    Jobs are removed from the buffer when the batch starts, so every one of
+    them ends with a stored result, a failure if anything goes wrong.
+
+    Returns:
+        dict: Task result information
+    """
+    if not SMSE_AVAILABLE:
+        return {
+            "status": "error",
+            "message": "SMSE framework is not available in this environment. This task should only run in worker containers.",
+        }
+
+    batch_size = current_app.config["EMBEDDING_BATCH_SIZE"]
+    jobs = _pop_embedding_jobs(batch_size)
+    if not jobs:
+        return {"status": "success", "processed": 0, "failed": 0}
+
+    finished = set()  # Task IDs whose result has been stored
+
+    def fail(job, error):
+        self.backend.mark_as_failure(job["task_id"], error)
+        finished.add(job["task_id"])
+
+    try:
+        # Group the jobs by modality so each group is one model call
+        jobs_by_modality = {}
+        for job in jobs:
+            try:
+                modality = _get_smse_modality_for_file(job["file_path"])
+            except Exception as e:
+                fail(job, e)
+                continue
+            jobs_by_modality.setdefault(modality, []).append(job)
+
+        contents = {
+            content.id: content
+            for content in Content.query.filter(
+                Content.id.in_([job["content_id"] for job in jobs])
+            )
+        }
+        model_id = current_app.config["DEFAULT_MODEL_ID"]
+
+        embedded = []
+        for modality, modality_jobs in jobs_by_modality.items():
+            file_paths = [job["file_path"] for job in modality_jobs]
+            results = _embed_files(file_paths, modality)
+
+            for job, result in zip(modality_jobs, results):
+                if isinstance(result, Exception):
+                    fail(job, result)
+                    continue
+
+                new_embedding = Embedding(
+                    vector=result,
+                    model_id=model_id,
+                    modality=modality.name.lower(),
+                )
+                db.session.add(new_embedding)
+
+                content = contents.get(job["content_id"])
+                if content:
+                    content.embedding = new_embedding
+                embedded.append((job, new_embedding, modality))
+
+        db.session.commit()
+
+        for job, new_embedding, modality in embedded:
+            self.backend.store_result(
+                job["task_id"],
+                {
+                    "status": "success",
+                    "embedding_id": new_embedding.id,
+                    "content_id": job["content_id"],
+                    "modality": modality.name,
+                },
+                "SUCCESS",
+            )
+            finished.add(job["task_id"])
+
+    except Exception as e:
+        db.session.rollback()
+        for job in jobs:
+            if job["task_id"] not in finished:
+                self.backend.mark_as_failure(job["task_id"], e)
+        raise e
+
+    finally:
+        _schedule_next_batch(self, batch_size)
+
+    return {
+        "status": "success",
+        "processed": len(embedded),
+        "failed": len(jobs) - len(embedded),
+    }
+
+
 @shared_task(
     bind=True, name="process_query", priority=10
 )  # Higher priority than content processing
@@ -408,3 +606,37 @@ def process_query(self, query_content, is_file=False, file_path=None):
         )
         # Re-raise the exception
         raise e
+
+
+@shared_task(name="delete_files")
+def delete_files(file_paths):
+    """
+    Celery task to delete files from storage outside of the request cycle.
+
+    Args:
+        file_paths (list): Storage paths/keys of the files to delete
+
+    Returns:
+        dict: Task result information
+    """
+    files_deleted = 0
+    for file_path in file_paths:
+        if current_app.file_storage.delete_file(file_path):
+            files_deleted += 1
+
+    return {"status": "success", "files_deleted": files_deleted}
+
+
+@shared_task(name="delete_user_directory")
+def delete_user_directory(user_id):
+    """
+    Celery task to delete a user's directory and all of its files.
+
+    Args:
+        user_id (int): ID of the user whose directory should be deleted
+
+    Returns:
+        dict: Task result information
+    """
+    success = current_app.file_storage.delete_user_directory(user_id)
+    return {"status": "success" if success else "error", "user_id": user_id}
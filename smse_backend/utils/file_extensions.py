@@ -7,7 +7,9 @@ import os
 
 # Extensions allowed for upload - read from environment variable if available
 env_extensions = os.getenv("ALLOWED_EXTENSIONS", "txt,jpg,jpeg,wav")
-ALLOWED_EXTENSIONS = set(env_extensions.split(","))
+ALLOWED_EXTENSIONS = frozenset(
+    ext.strip().lower().lstrip(".") for ext in env_extensions.split(",") if ext.strip()
+)
 
 # Mapping of file extensions to modalities
 EXTENSION_TO_MODALITY = {
@@ -55,7 +57,8 @@ def is_allowed_file(filename):
     Returns:
         bool: True if the file extension is allowed, False otherwise
     """
-    return "." in filename and filename.rsplit(".", 1)[1].lower() in ALLOWED_EXTENSIONS
+    ext = os.path.splitext(filename)[1][1:].lower()
+    return bool(ext) and ext in ALLOWED_EXTENSIONS
 
 
 def get_allowed_extensions():
@@ -12,13 +12,27 @@ def mock_celery_tasks():
         "smse_backend.services.embedding.schedule_embedding_task"
     ) as mock_schedule_task, patch(
         "smse_backend.services.embedding.generate_query_embedding"
-    ) as mock_generate_embedding:
+    ) as mock_generate_embedding, patch(
+        "smse_backend.services.embedding.schedule_query_embedding_task"
+    ) as mock_schedule_query_task, patch(
+        "smse_backend.services.embedding.collect_query_embedding"
+    ) as mock_collect_embedding, patch(
+        "smse_backend.services.file_cleanup.schedule_file_deletion"
+    ) as mock_schedule_file_deletion, patch(
+        "smse_backend.services.file_cleanup.schedule_user_directory_deletion"
+    ) as mock_schedule_user_directory_deletion:
 
         # Return a string task ID (not a MagicMock object)
         mock_schedule_task.return_value = "mocked-task-id-12345"
 
         # Configure the generate_query_embedding mock
         mock_generate_embedding.return_value = (np.random.rand(1024), "text")
+        mock_schedule_query_task.return_value = "mocked-query-task"
+        mock_collect_embedding.return_value = (np.random.rand(1024), "text")
+
+        # Return string task IDs for the background file deletion tasks
+        mock_schedule_file_deletion.return_value = "mocked-task-id-67890"
+        mock_schedule_user_directory_deletion.return_value = "mocked-task-id-67891"
 
         yield
 
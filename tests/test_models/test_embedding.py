@@ -88,3 +88,18 @@ def test_embedding_model_relationship(db_session, sample_embedding, sample_model
     """Test embedding-model relationship"""
     assert sample_embedding.model == sample_model
     assert sample_embedding in sample_model.embeddings
+
+
+def test_vector_round_trip_float32(db_session, sample_model):
+    """Test vectors are stored and loaded back as float32"""
+    vector = np.random.rand(1024)
+    embedding = Embedding(vector=vector, model_id=sample_model.id)
+    db_session.add(embedding)
+    db_session.commit()
+    embedding_id = embedding.id
+    db_session.expire_all()
+
+    stored = db_session.get(Embedding, embedding_id).vector
+
+    assert stored.dtype == np.float32
+    assert np.array_equal(stored, vector.astype(np.float32))
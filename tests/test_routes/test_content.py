@@ -1,9 +1,9 @@
 import datetime
 from mimetypes import guess_type
-from unittest.mock import MagicMock
+from unittest.mock import MagicMock, patch
 import numpy as np
 import pytest
-from smse_backend.models import Content, Embedding, Model, User
+from smse_backend.models import Content, Embedding, Model, Task, User
 from flask_jwt_extended import create_access_token
 from io import BytesIO
 import os
@@ -71,12 +71,95 @@ def test_create_content(client, auth_header, sample_user, sample_model):
         content_type="multipart/form-data",
     )
 
-    assert response.status_code == 201
+    assert response.status_code == 202
     assert response.json["message"] == "Content created successfully"
+    assert response.json["content_id"] == response.json["content"]["id"]
     assert "task_id" in response.json
     assert response.json["task_id"] == "mocked-task-id-12345"  # Match the mock ID
 
 
+def test_create_content_duplicate(
+    client, auth_header, sample_user, sample_embedding, db_session
+):
+    """Test that duplicate uploads are detected by content hash."""
+    data = {"file": (BytesIO(b"duplicate content"), "test.txt")}
+    response = client.post(
+        "/api/contents",
+        headers=auth_header,
+        data=data,
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 202
+    content_id = response.json["content_id"]
+
+    # The same user uploading the same bytes gets the existing content back
+    data = {"file": (BytesIO(b"duplicate content"), "copy.txt")}
+    response = client.post(
+        "/api/contents",
+        headers=auth_header,
+        data=data,
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 200
+    assert response.json["message"] == "Content already exists"
+    assert response.json["content_id"] == content_id
+    assert response.json["task_id"] is None
+
+    # Another user's identical upload copies the embedding instead of queueing it
+    db_session.get(Content, content_id).embedding = sample_embedding
+    other_user = User(username="otheruser", email="otheruser@test.com")
+    other_user.set_password("password123")
+    db_session.add(other_user)
+    db_session.commit()
+
+    data = {"file": (BytesIO(b"duplicate content"), "test.txt")}
+    response = client.post(
+        "/api/contents",
+        headers={
+            "Authorization": f"Bearer {create_access_token(identity=str(other_user.id))}"
+        },
+        data=data,
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 201
+    assert response.json["task_id"] is None
+    new_content = db_session.get(Content, response.json["content_id"])
+    assert new_content.embedding is not None
+    assert new_content.embedding.id != sample_embedding.id
+
+
+def test_create_content_streaming_upload(
+    app, client, auth_header, sample_user, sample_model
+):
+    """Test the POST /contents route with streaming uploads enabled."""
+    app.config["STREAMING_UPLOADS"] = True
+
+    data = {"file": (BytesIO(b"streamed file content"), "test.txt")}
+    response = client.post(
+        "/api/contents",
+        headers=auth_header,
+        data=data,
+        content_type="multipart/form-data",
+    )
+
+    assert response.status_code == 202
+    content_path = response.json["content"]["content_path"]
+    assert content_path.startswith(f"{sample_user.id}/")
+    assert content_path.endswith("_test.txt")
+    with open(app.file_storage.get_full_path(content_path), "rb") as f:
+        assert f.read() == b"streamed file content"
+
+    data = {"file": (BytesIO(b"file content"), "test.exe")}
+    response = client.post(
+        "/api/contents",
+        headers=auth_header,
+        data=data,
+        content_type="multipart/form-data",
+    )
+    assert response.status_code == 400
+    assert response.json["msg"] == "File type not allowed"
+
+
 def test_get_all_contents(client, auth_header, sample_content):
     """Test the GET /contents route."""
     response = client.get("/api/contents", headers=auth_header)
@@ -85,6 +168,37 @@ def test_get_all_contents(client, auth_header, sample_content):
     assert response.json["contents"][0]["id"] == sample_content.id
 
 
+def test_get_all_contents_keyset_pagination(
+    client, auth_header, sample_user, db_session
+):
+    """Test paging through GET /contents with the after_id cursor."""
+    for i in range(3):
+        db_session.add(
+            Content(
+                content_path=f"{sample_user.id}/file_{i}.txt",
+                user_id=sample_user.id,
+                content_size=1,
+            )
+        )
+    db_session.commit()
+
+    response = client.get("/api/contents?limit=2", headers=auth_header)
+    assert response.status_code == 200
+    first_page = [content["id"] for content in response.json["contents"]]
+    assert len(first_page) == 2
+    assert response.json["pagination"]["has_more"] is True
+
+    after_id = response.json["pagination"]["next_cursor"]["after_id"]
+    response = client.get(
+        f"/api/contents?limit=2&after_id={after_id}", headers=auth_header
+    )
+    second_page = [content["id"] for content in response.json["contents"]]
+    assert len(second_page) == 1
+    assert second_page[0] > max(first_page)
+    assert response.json["pagination"]["has_more"] is False
+    assert response.json["pagination"]["next_cursor"] is None
+
+
 def test_get_content(client, auth_header, sample_content):
     """Test the GET /contents/<int:content_id> route."""
     response = client.get(f"/api/contents/{sample_content.id}", headers=auth_header)
@@ -92,6 +206,37 @@ def test_get_content(client, auth_header, sample_content):
     assert response.json["content"]["id"] == sample_content.id
 
 
+def test_get_embedding_status(
+    client, auth_header, sample_user, sample_content, db_session, monkeypatch
+):
+    """Test the GET /contents/<id>/embedding_status route."""
+    task = Task(
+        task_id="embed-task-1",
+        status="PENDING",
+        content_id=sample_content.id,
+        user_id=sample_user.id,
+    )
+    db_session.add(task)
+    db_session.commit()
+
+    mock_async_result = MagicMock()
+    mock_async_result.return_value.state = "STARTED"
+    monkeypatch.setattr("smse_backend.routes.content.AsyncResult", mock_async_result)
+
+    response = client.get(
+        f"/api/contents/{sample_content.id}/embedding_status", headers=auth_header
+    )
+
+    assert response.status_code == 200
+    assert response.json["task_id"] == "embed-task-1"
+    assert response.json["status"] == "STARTED"
+    assert response.json["embedded"] is True
+    mock_async_result.assert_called_once_with("embed-task-1")
+
+    response = client.get("/api/contents/999/embedding_status", headers=auth_header)
+    assert response.status_code == 404
+
+
 def test_update_content(client, auth_header, sample_content):
     """Test the PUT /contents/<int:content_id> route."""
     data = {"content_tag": False}
@@ -109,6 +254,23 @@ def test_delete_content(client, auth_header, sample_content):
     assert response.json["message"] == "Content deleted successfully"
 
 
+def test_delete_content_schedules_file_deletion(
+    client, auth_header, sample_content, monkeypatch
+):
+    """Test that DELETE /contents/<int:content_id> deletes files in the background."""
+    content_path = sample_content.content_path
+    mock_schedule_file_deletion = MagicMock(return_value="task_123")
+    monkeypatch.setattr(
+        "smse_backend.services.file_cleanup.schedule_file_deletion",
+        mock_schedule_file_deletion,
+    )
+
+    response = client.delete(f"/api/contents/{sample_content.id}", headers=auth_header)
+
+    assert response.status_code == 200
+    mock_schedule_file_deletion.assert_called_once_with([content_path])
+
+
 def test_get_allowed_extensions(client):
     """Test the GET /contents/allowed_extensions route."""
     response = client.get("/api/contents/allowed_extensions")
@@ -116,12 +278,15 @@ def test_get_allowed_extensions(client):
     assert "txt" in response.json["allowed_extensions"]
 
 
-def test_download_content_by_id(client, auth_header, sample_content, monkeypatch):
+def test_download_content_by_id(
+    app, client, auth_header, sample_content, monkeypatch
+):
     """Test download content by ID successfully."""
+    full_path = app.file_storage.get_full_path(sample_content.content_path)
     mock_send_file = MagicMock(return_value=sample_content.content_path)
 
     def mock_os_path_exists(path):
-        return path == sample_content.content_path
+        return path == full_path
 
     monkeypatch.setattr("os.path.exists", mock_os_path_exists)
     monkeypatch.setattr("smse_backend.routes.content.send_file", mock_send_file)
@@ -133,17 +298,20 @@ def test_download_content_by_id(client, auth_header, sample_content, monkeypatch
 
     assert response.status_code == 200
     mock_send_file.assert_called_once_with(
-        sample_content.content_path, mimetype=guess_type(sample_content.content_path)[0]
+        full_path, mimetype=guess_type(sample_content.content_path)[0]
     )
     assert response.data.decode() == sample_content.content_path
 
 
-def test_download_content_by_path(client, auth_header, sample_content, monkeypatch):
+def test_download_content_by_path(
+    app, client, auth_header, sample_content, monkeypatch
+):
     """Test download content by path successfully."""
+    full_path = app.file_storage.get_full_path(sample_content.content_path)
     mock_send_file = MagicMock(return_value=sample_content.content_path)
 
     def mock_os_path_exists(path):
-        return path == sample_content.content_path
+        return path == full_path
 
     monkeypatch.setattr("os.path.exists", mock_os_path_exists)
     monkeypatch.setattr("smse_backend.routes.content.send_file", mock_send_file)
@@ -155,12 +323,35 @@ def test_download_content_by_path(client, auth_header, sample_content, monkeypat
 
     assert response.status_code == 200
     mock_send_file.assert_called_once_with(
-        sample_content.content_path,
+        full_path,
         mimetype=guess_type(sample_content.content_path)[0],
     )
     assert response.data.decode() == sample_content.content_path
 
 
+def test_download_content_x_accel_redirect(
+    app, client, auth_header, sample_content, monkeypatch
+):
+    """Test that downloads are handed to the proxy when X-Accel-Redirect is on."""
+    app.config["USE_X_ACCEL_REDIRECT"] = True
+    mock_send_file = MagicMock()
+    monkeypatch.setattr("os.path.exists", lambda path: True)
+    monkeypatch.setattr("smse_backend.routes.content.send_file", mock_send_file)
+
+    response = client.get(
+        "/api/contents/download?content_id={}".format(sample_content.id),
+        headers=auth_header,
+    )
+
+    assert response.status_code == 200
+    assert response.headers["X-Accel-Redirect"] == (
+        "/internal_uploads/" + sample_content.content_path.lstrip("/")
+    )
+    assert response.headers["Content-Type"] == "text/plain"
+    assert response.data == b""
+    mock_send_file.assert_not_called()
+
+
 def test_download_content_missing_query_params(client, auth_header):
     """Test download content with missing query parameters."""
     response = client.get("/api/contents/download", headers=auth_header)
@@ -195,6 +386,16 @@ def test_download_content_unauthorized_access(
     assert response.json["message"] == "Unauthorized access"
 
 
+def test_download_content_path_traversal(client, auth_header, sample_user):
+    """Test that a path escaping the user's directory is rejected."""
+    response = client.get(
+        f"/api/contents/download?file_path={sample_user.id}/../999/file.txt",
+        headers=auth_header,
+    )
+    assert response.status_code == 403
+    assert response.json["message"] == "Unauthorized access"
+
+
 def test_download_content_non_existent_path(
     client, auth_header, sample_content, monkeypatch
 ):
@@ -231,9 +432,10 @@ def test_upload_image_with_thumbnail_generation(
 
     # Mock file storage operations
     mock_file_storage = MagicMock()
-    mock_file_storage.save_uploaded_file.return_value = (
+    mock_file_storage.save_uploaded_file_with_hash.return_value = (
         f"{sample_user.id}/test_image.jpg",
         5.0,
+        "0" * 64,
     )
 
     # Mock thumbnail service
@@ -261,7 +463,7 @@ def test_upload_image_with_thumbnail_generation(
         content_type="multipart/form-data",
     )
 
-    assert response.status_code == 201
+    assert response.status_code == 202
     data = response.json
 
     # Verify response includes thumbnail URL
@@ -300,6 +502,71 @@ def test_get_thumbnail_success(client, auth_header, sample_content, monkeypatch)
     assert response.content_type == "image/jpeg"
 
 
+def test_get_thumbnail_serves_original_until_generated(
+    client, auth_header, sample_content, monkeypatch, tmp_path
+):
+    """Test that the owner gets the original image until the thumbnail exists."""
+    sample_content.content_path = f"{sample_content.user_id}/photo.png"
+    sample_content.thumbnail_path = f"{sample_content.user_id}/photo_thumb.jpg"
+    original = tmp_path / "photo.png"
+    original.write_bytes(b"original_png_data")
+
+    mock_file_storage = MagicMock()
+    mock_file_storage.is_local = True
+    mock_file_storage.download_file.return_value = None
+    mock_file_storage.get_full_path.return_value = str(original)
+    monkeypatch.setattr("flask.current_app.file_storage", mock_file_storage)
+
+    response = client.get(
+        f"/api/contents/thumbnail/{sample_content.id}",
+        headers=auth_header,
+    )
+
+    assert response.status_code == 200
+    assert response.data == b"original_png_data"
+    assert response.content_type == "image/png"
+    assert response.headers["Cache-Control"] == "no-store"
+    # The original is streamed from disk, never read through download_file
+    mock_file_storage.download_file.assert_called_once_with(
+        sample_content.thumbnail_path
+    )
+    mock_file_storage.file_exists.assert_not_called()
+
+
+def test_get_thumbnail_pending_hides_original(client, sample_content, monkeypatch):
+    """Test that only the owner gets the original image in place of a thumbnail."""
+    sample_content.thumbnail_path = f"{sample_content.user_id}/photo_thumb.jpg"
+
+    mock_file_storage = MagicMock()
+    mock_file_storage.is_local = True
+    mock_file_storage.download_file.return_value = None
+    monkeypatch.setattr("flask.current_app.file_storage", mock_file_storage)
+
+    response = client.get(f"/api/contents/thumbnail/{sample_content.id}")
+
+    assert response.status_code == 202
+    assert response.json["message"] == "Thumbnail is being generated"
+    mock_file_storage.get_full_path.assert_not_called()
+
+
+def test_failed_thumbnail_is_unlinked(app, sample_content, db_session):
+    """Test that a failed thumbnail clears the content's thumbnail path."""
+    sample_content.thumbnail_path = f"{sample_content.user_id}/photo_thumb.jpg"
+    db_session.commit()
+
+    with patch.object(
+        app.thumbnail_service,
+        "generate_and_save_thumbnail_from_path",
+        return_value=None,
+    ):
+        result = app.thumbnail_service.schedule_thumbnail(
+            f"{sample_content.user_id}/photo.png", content_id=sample_content.id
+        )
+
+    assert result is None
+    assert db_session.get(Content, sample_content.id).thumbnail_path is None
+
+
 def test_get_thumbnail_not_found(client, auth_header, sample_content):
     """Test retrieving thumbnail for content without thumbnail."""
     response = client.get(
@@ -1,5 +1,13 @@
+import numpy as np
+
+
 def test_health_check(client):
     """Test the health check endpoint."""
     response = client.get("/api/health")
     assert response.status_code == 200
     assert response.json == {"status": "ok", "message": "Welcome to the SMSE API"}
+
+
+def test_json_provider_non_str_keys_and_numpy(app):
+    """Test responses serialize integer keys and numpy values like the default."""
+    assert app.json.dumps({2: "b", 1: np.arange(2)}) == '{"1":[0,1],"2":"b"}'
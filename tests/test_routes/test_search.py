@@ -1,4 +1,5 @@
 import datetime
+from unittest.mock import patch
 import pytest
 from flask_jwt_extended import create_access_token
 from smse_backend.models import Query, SearchRecord, User, Content, Embedding, Model
@@ -124,6 +125,39 @@ def test_search_files(
     assert "query_id" in response.json
 
 
+def test_search_files_keeps_query_when_search_fails(
+    client,
+    auth_header,
+    sample_user,
+    sample_model,
+    sample_content,
+    db_session,
+):
+    """Test that a failed search only rolls back its own savepoint."""
+
+    def failing_search(**kwargs):
+        # Write inside the search savepoint, then fail like the search SQL does
+        db_session.add(Embedding(vector=np.ones(1024), model_id=sample_model.id))
+        db_session.flush()
+        raise RuntimeError("search failed")
+
+    embedding_count = db_session.query(Embedding).count()
+
+    with patch(
+        "smse_backend.services.search.search_all_modalities",
+        side_effect=failing_search,
+    ):
+        response = client.post(
+            "/api/search", headers=auth_header, json={"query": "failing query"}
+        )
+
+    assert response.status_code == 200
+    assert response.json["results"] == []
+    # The query and its embedding are stored; the search's writes are not
+    assert db_session.get(Query, response.json["query_id"]) is not None
+    assert db_session.query(Embedding).count() == embedding_count + 1
+
+
 def test_get_query_history(client, auth_header, sample_query):
     """Test the GET /queries route."""
     response = client.get("/api/search", headers=auth_header)
@@ -133,6 +167,40 @@ def test_get_query_history(client, auth_header, sample_query):
     assert response.json["queries"][0]["id"] == sample_query.id
 
 
+def test_get_query_history_keyset_pagination(
+    client, auth_header, sample_user, sample_model, db_session
+):
+    """Test paging through GET /search with the before_ts/before_id cursor."""
+    for i in range(3):
+        embedding = Embedding(vector=np.random.rand(1024), model_id=sample_model.id)
+        db_session.add(embedding)
+        db_session.flush()
+        db_session.add(
+            Query(
+                text=f"query {i}",
+                user_id=sample_user.id,
+                embedding_id=embedding.id,
+                timestamp=datetime.datetime(2023, 10, 1, 12, i),
+            )
+        )
+    db_session.commit()
+
+    response = client.get("/api/search?limit=2", headers=auth_header)
+    assert response.status_code == 200
+    assert [q["text"] for q in response.json["queries"]] == ["query 2", "query 1"]
+    cursor = response.json["pagination"]["next_cursor"]
+
+    response = client.get(
+        "/api/search?limit=2&before_ts={}&before_id={}".format(
+            cursor["before_ts"], cursor["before_id"]
+        ),
+        headers=auth_header,
+    )
+    assert response.status_code == 200
+    assert [q["text"] for q in response.json["queries"]] == ["query 0"]
+    assert response.json["pagination"]["has_more"] is False
+
+
 def test_delete_query(client, auth_header, sample_query, db_session):
     """Test the DELETE /queries/<int:query_id> route."""
     response = client.delete(f"/api/search/{sample_query.id}", headers=auth_header)
@@ -0,0 +1,137 @@
+"""
+Unit tests for the embedding service helpers
+"""
+
+import numpy as np
+import pytest
+from unittest.mock import MagicMock
+from redis.exceptions import ConnectionError as RedisConnectionError
+from smse_backend.services.embedding import (
+    EmbeddingsCache,
+    generate_multipart_embedding,
+)
+from smse_backend.utils.ttl_cache import TTLCache
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the Redis commands the cache uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def mget(self, *keys):
+        return [self.data.get(key) for key in keys]
+
+    def pipeline(self):
+        return FakePipeline(self)
+
+
+class FakePipeline:
+    def __init__(self, redis_client):
+        self.redis = redis_client
+        self.commands = []
+
+    def set(self, key, value, ex=None):
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self.commands.append((key, value))
+
+    def execute(self):
+        for key, value in self.commands:
+            self.redis.data[key] = value
+
+
+@pytest.fixture
+def cache(app):
+    with app.app_context():
+        yield EmbeddingsCache(FakeRedis(), model_id=1, ttl=60)
+
+
+class TestEmbeddingsCache:
+
+    def test_round_trip(self, cache):
+        """Test that a stored embedding is returned as float32 with its modality."""
+        key = cache.key_for_text("a cat")
+        assert cache.get(key) is None
+
+        embedding = np.random.rand(1024)
+        cache.set(key, embedding, "text")
+        cached_embedding, modality = cache.get(key)
+
+        assert cached_embedding.dtype == np.float32
+        assert np.allclose(cached_embedding, embedding.astype(np.float32))
+        assert modality == "text"
+
+    def test_text_key_ignores_whitespace(self, cache):
+        """Test that whitespace differences map to the same key."""
+        assert cache.key_for_text("  a   cat ") == cache.key_for_text("a cat")
+        assert cache.key_for_text("a cat") != cache.key_for_text("a dog")
+
+    def test_file_key_hashes_content(self, cache, tmp_path):
+        """Test that files are keyed by content and missing files aren't cached."""
+        first = tmp_path / "first.txt"
+        second = tmp_path / "second.txt"
+        first.write_bytes(b"same content")
+        second.write_bytes(b"same content")
+
+        assert cache.key_for_file(str(first)) == cache.key_for_file(str(second))
+        assert cache.key_for_file(str(tmp_path / "missing.txt")) is None
+
+    def test_local_cache_skips_redis(self, app):
+        """Test that repeated lookups are answered from process memory."""
+        redis_client = FakeRedis()
+        local_cache = TTLCache(maxsize=10, ttl=60)
+
+        with app.app_context():
+            writer = EmbeddingsCache(redis_client, local_cache=TTLCache(10, 60))
+            writer.set("key", np.ones(1024), "image")
+
+            cache = EmbeddingsCache(redis_client, local_cache=local_cache)
+            assert cache.get("key")[1] == "image"
+            redis_client.data.clear()
+            embedding, modality = cache.get("key")
+
+        assert np.allclose(embedding, 1.0)
+        assert not embedding.flags.writeable
+        assert modality == "image"
+
+    def test_redis_errors_are_cache_misses(self, app):
+        """Test that an unavailable Redis doesn't break embedding."""
+        redis_client = MagicMock()
+        redis_client.mget.side_effect = RedisConnectionError("down")
+        redis_client.pipeline.return_value.execute.side_effect = RedisConnectionError(
+            "down"
+        )
+
+        with app.app_context():
+            cache = EmbeddingsCache(redis_client)
+            assert cache.get("key") is None
+            cache.set("key", np.zeros(1024), "text")
+
+
+class TestGenerateMultipartEmbedding:
+
+    def test_mean_and_primary_modality(self):
+        """Test that embeddings are averaged and the most common modality wins."""
+        embeddings = [np.full(4, 1.0), np.full(4, 2.0), np.full(4, 6.0)]
+
+        combined, modality = generate_multipart_embedding(
+            embeddings, ["image", "text", "text"]
+        )
+
+        assert combined.dtype == np.float32
+        assert np.allclose(combined, np.full(4, 3.0))
+        assert modality == "text"
+
+    def test_tie_prefers_first_modality(self):
+        """Test that ties resolve to the first modality seen."""
+        _, modality = generate_multipart_embedding(
+            [np.zeros(4), np.ones(4)], ["audio", "image"]
+        )
+        assert modality == "audio"
+
+    def test_mismatched_shapes(self):
+        """Test that embeddings of different dimensions are rejected."""
+        assert generate_multipart_embedding(
+            [np.zeros(4), np.zeros(3)], ["text", "text"]
+        ) == (None, None)
@@ -0,0 +1,241 @@
+"""
+Unit tests for the FileStorageService with local storage
+"""
+
+import asyncio
+import hashlib
+import io
+import os
+import tempfile
+import time
+import uuid
+import pytest
+from werkzeug.datastructures import FileStorage
+from smse_backend.services.file_storage import (
+    FileStorageService,
+    LocalStorageBackend,
+)
+from smse_backend.utils.ttl_cache import TTLCache
+
+
+@pytest.fixture
+def file_storage(app, tmp_path):
+    """Create a FileStorageService backed by a temporary local directory."""
+    with app.app_context():
+        service = FileStorageService()
+        service._backend = LocalStorageBackend(str(tmp_path))
+        yield service
+
+
+@pytest.fixture
+def user_files(tmp_path):
+    """Create a small tree of files for user 1."""
+    (tmp_path / "1" / "queries").mkdir(parents=True)
+    (tmp_path / "1" / "a.txt").write_bytes(b"a" * 10)
+    (tmp_path / "1" / "queries" / "b.txt").write_bytes(b"b" * 5)
+    (tmp_path / "2").mkdir()
+    (tmp_path / "2" / "c.txt").write_bytes(b"c" * 7)
+
+
+class TestLocalFileStorage:
+
+    def test_list_user_files(self, file_storage, user_files):
+        """Test that user files are listed recursively as storage keys."""
+        assert sorted(file_storage.list_user_files(1)) == [
+            "1/a.txt",
+            "1/queries/b.txt",
+        ]
+        assert file_storage.list_user_files(1, "queries") == ["1/queries/b.txt"]
+        assert file_storage.list_user_files(3) == []
+
+    def test_iter_user_files(self, file_storage, user_files):
+        """Test that the lazy listing yields the same keys as the list."""
+        files = file_storage.iter_user_files(1)
+        assert not isinstance(files, list)
+        assert sorted(files) == ["1/a.txt", "1/queries/b.txt"]
+        assert list(file_storage.iter_user_files(3)) == []
+
+    def test_get_directory_size(self, file_storage, user_files):
+        """Test that directory sizes include nested files."""
+        assert file_storage.get_directory_size("1") == 15
+        assert file_storage.get_directory_size("2/") == 7
+        assert file_storage.get_directory_size("3") == 0
+
+    def test_get_file_size_info(self, file_storage, tmp_path):
+        """Test that sizes are read from in-memory and on-disk uploads alike."""
+        in_memory = FileStorage(stream=io.BytesIO(b"x" * 2048), filename="a.txt")
+        assert file_storage.get_file_size_info(in_memory) == (2048, 2.0)
+        assert in_memory.stream.tell() == 0
+
+        spooled = tempfile.SpooledTemporaryFile(max_size=1024)
+        spooled.write(b"y" * 4096)
+        spooled.seek(0)
+        on_disk = FileStorage(stream=spooled, filename="b.txt")
+        assert file_storage.get_file_size_info(on_disk) == (4096, 4.0)
+
+    def test_copy_file(self, file_storage, user_files, tmp_path):
+        """Test that copies keep the content and modification time."""
+        assert file_storage.copy_file("1/a.txt", "2/copies/a.txt")
+
+        source = tmp_path / "1" / "a.txt"
+        copy = tmp_path / "2" / "copies" / "a.txt"
+        assert copy.read_bytes() == source.read_bytes()
+        assert copy.stat().st_mtime == source.stat().st_mtime
+        assert not file_storage.copy_file("1/missing.txt", "2/missing.txt")
+
+    def test_delete_user_directory(self, file_storage, user_files, tmp_path):
+        """Test that a user's whole tree is removed and missing users are fine."""
+        assert file_storage.delete_user_directory(1)
+        assert not (tmp_path / "1").exists()
+        assert (tmp_path / "2" / "c.txt").exists()
+        assert file_storage.delete_user_directory(3)
+
+    def test_cleanup_temp_query_files(self, file_storage, user_files, tmp_path):
+        """Test that stale query files are removed and emptied subdirectories pruned."""
+        stale = time.time() - 2 * 24 * 3600
+        nested = tmp_path / "1" / "queries" / "nested"
+        nested.mkdir()
+        (nested / "old.txt").write_bytes(b"old")
+        os.utime(nested / "old.txt", (stale, stale))
+        os.utime(tmp_path / "1" / "queries" / "b.txt", (stale, stale))
+        (tmp_path / "2" / "queries").mkdir()
+        (tmp_path / "2" / "queries" / "new.txt").write_bytes(b"new")
+
+        assert file_storage.cleanup_temp_query_files(age_in_hours=24) == 2
+        assert not nested.exists()
+        assert (tmp_path / "1" / "queries").is_dir()
+        assert (tmp_path / "1" / "a.txt").exists()
+        assert (tmp_path / "2" / "queries" / "new.txt").exists()
+
+    def test_save_after_user_directory_deleted(self, file_storage, tmp_path):
+        """Test that remembered directories are recreated after a delete."""
+        upload = FileStorage(stream=io.BytesIO(b"data"), filename="a.txt")
+        file_storage.save_uploaded_file(upload, 1)
+        assert file_storage.delete_user_directory(1)
+
+        upload = FileStorage(stream=io.BytesIO(b"data"), filename="b.txt")
+        relative_path, _ = file_storage.save_uploaded_file(upload, 1)
+        assert (tmp_path / relative_path).read_bytes() == b"data"
+
+    def test_get_full_path(self, file_storage, tmp_path):
+        """Test that keys are normalized into the root and escapes are refused."""
+        root = str(tmp_path)
+        assert file_storage.get_full_path("1/a.txt") == f"{root}/1/a.txt"
+        assert file_storage.get_full_path("1//./b/../a.txt") == f"{root}/1/a.txt"
+        assert file_storage.get_full_path("1/.a..txt") == f"{root}/1/.a..txt"
+        assert file_storage.get_full_path("1/") == f"{root}/1"
+
+        for key in ("../a.txt", "1/../../a.txt"):
+            with pytest.raises(ValueError):
+                file_storage.get_full_path(key)
+
+    def test_get_first_directory(self, file_storage):
+        """Test that the first path component is returned without the rest."""
+        assert file_storage.get_first_directory("1/queries/a.txt") == "1"
+        assert file_storage.get_first_directory("//12/a.txt") == "12"
+        assert file_storage.get_first_directory("a.txt") == "a.txt"
+        assert file_storage.get_first_directory("/") is None
+        assert file_storage.get_first_directory("") is None
+
+    def test_delete_large_user_directory(self, file_storage, tmp_path):
+        """Test that trees big enough for the thread pool are removed entirely."""
+        for subdirectory in ("", "queries", "queries/nested"):
+            directory = tmp_path / "1" / subdirectory
+            directory.mkdir(parents=True, exist_ok=True)
+            for i in range(150):
+                (directory / f"{i}.txt").write_bytes(b"x")
+
+        assert file_storage.delete_user_directory(1)
+        assert not (tmp_path / "1").exists()
+
+    def test_move_file(self, file_storage, user_files, tmp_path):
+        """Test that moves replace existing files and report missing sources."""
+        assert file_storage.move_file("1/a.txt", "2/c.txt")
+
+        assert not (tmp_path / "1" / "a.txt").exists()
+        assert (tmp_path / "2" / "c.txt").read_bytes() == b"a" * 10
+        assert not file_storage.move_file("1/a.txt", "2/d.txt")
+
+    def test_save_uploaded_file_size(self, file_storage, tmp_path):
+        """Test that saved uploads report their size from memory or disk spools."""
+        for size in (100, 8192):
+            spooled = tempfile.SpooledTemporaryFile(max_size=1024)
+            spooled.write(b"z" * size)
+            spooled.seek(0)
+            upload = FileStorage(stream=spooled, filename="a.txt")
+
+            relative_path, size_kb = file_storage.save_uploaded_file(upload, 1)
+
+            assert size_kb == round(size / 1024, 2)
+            assert (tmp_path / relative_path).read_bytes() == b"z" * size
+
+    def test_save_uploaded_file_with_hash(self, file_storage, tmp_path):
+        """Test that uploads are hashed in the same pass that saves them."""
+        upload = FileStorage(stream=io.BytesIO(b"hash me"), filename="a.txt")
+
+        relative_path, size_kb, content_hash = (
+            file_storage.save_uploaded_file_with_hash(upload, 1)
+        )
+
+        assert content_hash == hashlib.sha256(b"hash me").hexdigest()
+        assert size_kb == round(7 / 1024, 2)
+        assert (tmp_path / relative_path).read_bytes() == b"hash me"
+
+    def test_async_file_operations(self, file_storage, user_files, tmp_path):
+        """Test that async variants run the blocking operations in the pool."""
+
+        async def run():
+            assert await file_storage.afile_exists("1/a.txt")
+            assert await file_storage.acopy_file("1/a.txt", "2/a.txt")
+            assert await file_storage.adownload_file("2/a.txt") == b"a" * 10
+            assert await file_storage.adelete_file("1/a.txt")
+            return await file_storage.aget_file_info("1/a.txt")
+
+        assert asyncio.run(run()) is None
+        assert not (tmp_path / "1" / "a.txt").exists()
+
+    def test_generate_unique_filename(self, app, file_storage):
+        """Test that names get distinct version 7 UUID prefixes in both modes."""
+        for unguessable in (False, True):
+            app.config["UNGUESSABLE_FILENAMES"] = unguessable
+            names = [
+                file_storage.generate_unique_filename("my file.txt", "q")
+                for _ in range(100)
+            ]
+
+            assert len(set(names)) == 100
+            uuid_hex, _, rest = names[0].partition("_")
+            assert uuid.UUID(uuid_hex).version == 7
+            assert rest == "q_my_file.txt"
+
+
+class TestTTLCache:
+
+    def test_lru_eviction_and_discard(self):
+        """Test that the least recently used key is evicted first."""
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", None)
+        assert cache.get("a") == 1
+        cache.set("c", 3)
+
+        assert cache.get("b", "miss") == "miss"
+        assert cache.get("a") == 1
+        cache.discard("a", "c")
+        assert cache.get("a", "miss") == cache.get("c", "miss") == "miss"
+
+    def test_expiry(self, monkeypatch):
+        """Test that entries expire after the TTL and a zero TTL stores nothing."""
+        now = [100.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        cache = TTLCache(maxsize=10, ttl=5)
+        cache.set("a", 1)
+
+        now[0] += 4
+        assert cache.get("a") == 1
+        now[0] += 2
+        assert cache.get("a") is None
+
+        disabled = TTLCache(maxsize=10, ttl=0)
+        disabled.set("a", 1)
+        assert disabled.get("a") is None
@@ -0,0 +1,90 @@
+"""
+Unit tests for the search result cache
+"""
+
+import numpy as np
+from unittest.mock import MagicMock
+from redis.exceptions import ConnectionError as RedisConnectionError
+from smse_backend.services.query_cache import QueryResultCache
+
+
+class FakeRedis:
+    """Minimal in-memory stand-in for the Redis commands the cache uses."""
+
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        return self.data.get(key)
+
+    def pipeline(self):
+        return self
+
+    def incr(self, key):
+        self.data[key] = str(int(self.data.get(key) or 0) + 1).encode()
+
+    def expire(self, key, seconds):
+        pass
+
+    def execute(self):
+        pass
+
+
+class TestQueryResultCache:
+
+    def test_near_identical_embeddings_share_entries(self):
+        """Test that keys ignore tiny embedding differences and modality order."""
+        embedding = np.linspace(0, 1, 8, dtype=np.float32)
+        key = QueryResultCache.make_key(1, embedding, "text", ["text", "image"], 10)
+
+        assert key == QueryResultCache.make_key(
+            "1", embedding + 1e-5, "text", ["image", "text"], 10
+        )
+        assert key != QueryResultCache.make_key(1, embedding, "text", ["text"], 10)
+        assert key != QueryResultCache.make_key(2, embedding, "text", ["text"], 10)
+
+    def test_hits_misses_and_invalidation(self):
+        """Test that results are cached per user and dropped on invalidation."""
+        cache = QueryResultCache(maxsize=10, ttl=60)
+        embedding = np.zeros(8)
+        key = cache.make_key(1, embedding, "text", ["text"], 10)
+        other_key = cache.make_key(2, embedding, "text", ["text"], 10)
+        results = [{"content_id": 3, "similarity_score": 0.5}]
+
+        assert cache.get(key) is None
+        cache.put(key, results)
+        cache.put(other_key, results)
+        cached = cache.get(key)
+        assert cached == results
+        cached[0]["content_id"] = 4
+        assert cache.get(key) == results
+
+        cache.invalidate_user("1")
+        assert cache.get(key) is None
+        assert cache.get(other_key) == results
+        assert cache.stats() == {"hits": 3, "misses": 2, "hit_rate": 0.6}
+
+    def test_invalidation_reaches_other_processes(self):
+        """Test that a shared generation hides other processes' stale entries."""
+        redis_client = FakeRedis()
+        worker = QueryResultCache(maxsize=10, ttl=60, redis_client=redis_client)
+        other_worker = QueryResultCache(maxsize=10, ttl=60, redis_client=redis_client)
+        embedding = np.zeros(8)
+        results = [{"content_id": 3, "similarity_score": 0.5}]
+
+        key = worker.key_for(1, embedding, "text", ["text"], 10)
+        worker.put(key, results)
+        assert worker.get(worker.key_for(1, embedding, "text", ["text"], 10))
+
+        other_worker.invalidate_user(1)
+        assert worker.get(worker.key_for(1, embedding, "text", ["text"], 10)) is None
+        assert worker.key_for(2, embedding, "text", ["text"], 10) is not None
+
+    def test_unreadable_generation_bypasses_cache(self):
+        """Test that searches skip the cache while Redis is unavailable."""
+        redis_client = MagicMock()
+        redis_client.get.side_effect = RedisConnectionError("down")
+        cache = QueryResultCache(maxsize=10, ttl=60, redis_client=redis_client)
+
+        assert cache.key_for(1, np.zeros(8), "text", ["text"], 10) is None
+
@@ -0,0 +1,85 @@
+"""
+Unit tests for the search service helpers
+"""
+
+import numpy as np
+from unittest.mock import patch
+from smse_backend.services.search import (
+    MODALITY_INDEX,
+    THRESHOLD_MATRIX,
+    min_max_normalize,
+    modality_thresholds,
+    reciprocal_rank_fusion,
+    search,
+    softmax,
+)
+
+
+class TestScoreNormalization:
+
+    def test_softmax(self):
+        """Test that softmax keeps the order of scores and sums to 1."""
+        normalized = softmax([0.2, 0.5, 0.3])
+
+        assert normalized.dtype == np.float32
+        assert np.isclose(normalized.sum(), 1.0)
+        assert list(np.argsort(normalized)) == [0, 2, 1]
+        assert np.allclose(softmax(np.full(4, 1000.0)), 0.25)
+        assert softmax([]).size == 0
+
+    def test_min_max_normalize(self):
+        """Test that scores are scaled to [0, 1] and equal scores map to 1."""
+        assert np.allclose(min_max_normalize([0.2, 0.6, 0.4]), [0.0, 1.0, 0.5])
+        assert np.allclose(min_max_normalize([0.3, 0.3]), [1.0, 1.0])
+        assert min_max_normalize([]).size == 0
+
+    def test_reciprocal_rank_fusion(self):
+        """Test that scores are ranked within their own group."""
+        fused = reciprocal_rank_fusion(
+            ["text", "image", "text", "image", "text"],
+            [0.5, 0.2, 0.9, 0.3, 0.7],
+            k=0,
+        )
+
+        assert np.allclose(fused, [1 / 3, 1 / 2, 1, 1, 1 / 2])
+        assert reciprocal_rank_fusion([], []).size == 0
+
+
+class TestSearchRanking:
+
+    def test_threshold_matrix(self):
+        """Test that the threshold matrix matches the nested thresholds."""
+        for query_modality, thresholds in modality_thresholds.items():
+            row = THRESHOLD_MATRIX[MODALITY_INDEX[query_modality]]
+            for modality, threshold in thresholds.items():
+                assert row[MODALITY_INDEX[modality]] == threshold
+
+    def test_results_are_fused_by_rank(self, app):
+        """Test that modalities are merged by rank rather than raw similarity."""
+        rows = [
+            {"content_id": 1, "modality": "text", "similarity_score": 0.9},
+            {"content_id": 2, "modality": "text", "similarity_score": 0.8},
+            {"content_id": 3, "modality": "text", "similarity_score": 0.7},
+            {"content_id": 4, "modality": "image", "similarity_score": 0.3},
+            {"content_id": 5, "modality": "image", "similarity_score": 0.25},
+        ]
+
+        with app.app_context(), patch(
+            "smse_backend.services.search.search_all_modalities", return_value=rows
+        ):
+            results = search(np.ones(1024), "text", 1, limit=4)
+
+        assert [result["content_id"] for result in results] == [1, 4, 2, 5]
+        assert results[1]["similarity_score"] == 0.3
+        assert results[0]["fused_score"] == results[1]["fused_score"]
+
+    def test_invalid_embedding_skips_search(self, app):
+        """Test that empty and non-finite embeddings return no results."""
+        with app.app_context(), patch(
+            "smse_backend.services.search.search_all_modalities"
+        ) as mock_search:
+            assert search(np.array([]), "text", 1) == []
+            assert search(np.full(1024, np.nan), "text", 1) == []
+            assert search(None, "text", 1) == []
+
+        mock_search.assert_not_called()
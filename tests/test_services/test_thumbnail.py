@@ -6,6 +6,7 @@ import io
 import pytest
 from PIL import Image
 from unittest.mock import MagicMock, patch, mock_open
+from werkzeug.datastructures import FileStorage
 from smse_backend.services.thumbnail import ThumbnailService
 
 
@@ -65,6 +66,44 @@ class TestThumbnailService:
         assert thumbnail_image.size == (50, 50)
         assert thumbnail_image.format == "JPEG"
 
+    def test_generate_thumbnail_from_large_jpeg(self, thumbnail_service):
+        """Test that a reduced-scale JPEG decode still yields the exact size."""
+        img_bytes = io.BytesIO()
+        Image.new("RGB", (1600, 600), color="blue").save(img_bytes, format="JPEG")
+
+        thumbnail_bytes = thumbnail_service.generate_thumbnail_from_bytes(
+            img_bytes.getvalue(), (64, 36)
+        )
+
+        assert Image.open(io.BytesIO(thumbnail_bytes)).size == (64, 36)
+
+    def test_generate_thumbnail_from_file_storage(self, app, thumbnail_service):
+        """Test that uploads are read in place and rewound afterwards."""
+        file = FileStorage(stream=io.BytesIO(create_test_image_bytes()))
+
+        with app.app_context():
+            thumbnail_bytes = thumbnail_service.generate_thumbnail_from_file_storage(
+                file, (50, 50)
+            )
+
+        assert Image.open(io.BytesIO(thumbnail_bytes)).size == (50, 50)
+        assert file.stream.tell() == 0
+
+    def test_transparent_pixels_become_white(self, thumbnail_service):
+        """Test that transparency is flattened onto white, opaque alpha as is."""
+        for alpha, expected in ((0, (255, 255, 255)), (255, (0, 0, 255))):
+            img_bytes = io.BytesIO()
+            Image.new("RGBA", (100, 100), (0, 0, 255, alpha)).save(
+                img_bytes, format="PNG"
+            )
+
+            thumbnail_bytes = thumbnail_service.generate_thumbnail_from_bytes(
+                img_bytes.getvalue(), (50, 50)
+            )
+
+            pixel = Image.open(io.BytesIO(thumbnail_bytes)).getpixel((25, 25))
+            assert all(abs(a - b) <= 2 for a, b in zip(pixel, expected))
+
     @patch("builtins.open", new_callable=mock_open)
     def test_save_thumbnail_local_storage(self, mock_file_open, thumbnail_service):
         """Test saving thumbnail to local storage."""
@@ -105,3 +144,18 @@ class TestThumbnailService:
         mock_gen_path.assert_called_once_with("test.jpg")
         mock_gen_thumb.assert_called_once_with("test.jpg", None)
         mock_save.assert_called_once_with(b"thumbnail_bytes", "thumb_path.jpg")
+
+    def test_schedule_thumbnail_in_background(self, app, mock_file_storage):
+        """Test that scheduled thumbnails return their path before generation."""
+        service = ThumbnailService(mock_file_storage, max_workers=1)
+
+        with app.app_context(), patch.object(
+            ThumbnailService, "generate_and_save_thumbnail_from_path"
+        ) as mock_generate:
+            thumbnail_path = service.schedule_thumbnail("1/image.png")
+            service._get_executor().shutdown(wait=True)
+
+            assert service.schedule_thumbnail("1/notes.txt") is None
+
+        assert thumbnail_path == service.generate_thumbnail_path("1/image.png")
+        mock_generate.assert_called_once_with("1/image.png", None)